@@ -0,0 +1,265 @@
+import argparse
+import gc
+import glob
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from normal_form import Normaliser
+from saturation import Saturation
+
+ROLES = ['hasPart', 'hasFilling', 'madeFrom']
+
+
+def generate_axioms(size):
+    '''A DUMPLING-SHAPED SYNTHETIC TBOX WITH size CLASSES, AS (lhs, rhs) TERM PAIRS
+
+    A tree of told subsumptions, an existential every third class and a
+    defined conjunction every fifth, so all four normal forms show up and
+    the saturation has real edges to follow. Same size, same ontology.
+    '''
+    name = lambda i: ('name', f"C{i}")
+    axioms = []
+    for i in range(1, size):
+        axioms.append((name(i), name((i - 1) // 3)))
+        if i % 3 == 0:
+            axioms.append((name(i), ('some', ROLES[i % len(ROLES)], name(i // 2))))
+        if i % 5 == 0:
+            definition = ('and', (name(i // 5), ('some', ROLES[i % len(ROLES)], name(i // 2))))
+            axioms.append((name(i), definition))
+            axioms.append((definition, name(i)))
+    return axioms
+
+
+def term_to_owl(term):
+    '''TERM -> OWL/XML CLASS EXPRESSION'''
+    if term[0] == 'name':
+        return f'<Class IRI="#{term[1]}"/>'
+    if term[0] == 'and':
+        return "<ObjectIntersectionOf>" + "".join(term_to_owl(conjunct) for conjunct in term[1]) + "</ObjectIntersectionOf>"
+    return f'<ObjectSomeValuesFrom><ObjectProperty IRI="#{term[1]}"/>{term_to_owl(term[2])}</ObjectSomeValuesFrom>'
+
+
+def write_owl(axioms, path):
+    '''THE SAME AXIOMS AS AN OWL/XML FILE THE JAVA PARSER CAN READ'''
+    with open(path, mode='w') as file:
+        file.write('<?xml version="1.0"?>\n<Ontology xmlns="http://www.w3.org/2002/07/owl#" '
+                   'ontologyIRI="http://example.org/generated">\n')
+        for lhs, rhs in axioms:
+            file.write(f"    <SubClassOf>{term_to_owl(lhs)}{term_to_owl(rhs)}</SubClassOf>\n")
+        file.write("</Ontology>\n")
+    return path
+
+
+def current_rss():
+    '''RESIDENT SET SIZE RIGHT NOW IN KiB (PEAK SO FAR WHERE /proc ISN'T THERE)'''
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        return peak_rss()
+
+
+def peak_rss():
+    '''PEAK RSS IN KiB, SINCE THE LAST reset_peak_rss() IF THE KERNEL LETS US RESET IT'''
+    try:
+        with open('/proc/self/status') as file:
+            for line in file:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux but in bytes on macOS
+    return maxrss if sys.platform != "darwin" else maxrss // 1024
+
+
+def reset_peak_rss():
+    '''START A NEW RSS HIGH-WATER MARK (LINUX ONLY, OTHERWISE THE PEAK IS PROCESS-WIDE)'''
+    try:
+        with open('/proc/self/clear_refs', mode='w') as file:
+            file.write('5')
+    except OSError:
+        pass
+
+
+def java_proxies():
+    '''HOW MANY py4j PROXIES PYTHON IS STILL HOLDING (EACH ONE PINS AN OBJECT IN THE JVM)'''
+    if 'py4j.java_gateway' not in sys.modules:
+        return 0
+    JavaObject = sys.modules['py4j.java_gateway'].JavaObject
+    return sum(1 for obj in gc.get_objects() if isinstance(obj, JavaObject))
+
+
+class PhaseMemory:
+    '''MEASURE ONE PHASE: with PhaseMemory('parse', results): ...
+
+    tracemalloc sees Python allocations only (the JVM heap is on the other
+    side of the socket): peak is the high-water mark during the phase,
+    retained what is still allocated once it's over. RSS covers the whole
+    process, so it includes the interpreter and any native libraries.
+    '''
+    def __init__(self, phase, results):
+        self.phase = phase
+        self.results = results
+
+    def __enter__(self):
+        gc.collect()
+        reset_peak_rss()
+        tracemalloc.reset_peak()
+        self.start_traced = tracemalloc.get_traced_memory()[0]
+        self.start_rss = current_rss()
+        self.start_proxies = java_proxies()
+        self.start_time = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start_time
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        gc.collect()
+        self.results[self.phase] = {
+            'seconds': seconds,
+            'peak_bytes': traced_peak - self.start_traced,
+            'retained_bytes': tracemalloc.get_traced_memory()[0] - self.start_traced,
+            'peak_rss_kib': peak_rss(),
+            'rss_growth_kib': current_rss() - self.start_rss,
+            'java_proxies': java_proxies() - self.start_proxies,
+        }
+
+
+def benchmark_jvm(ontology_file):
+    '''PARSE, NORMALISE AND SATURATE ONE OWL FILE THROUGH THE GATEWAY'''
+    from reasoner_final import ELReasoner5000
+
+    results = {}
+    start = leftovers()
+    reasoner = ELReasoner5000()
+    reasoner.parser  # FETCH THE PARSER OUTSIDE THE MEASURED PHASE
+    with PhaseMemory('parse', results):
+        ontology = reasoner.parser.parseFile(ontology_file)
+    with PhaseMemory('normalise', results):
+        # NO source: THE ON-DISK NORMAL FORM CACHE WOULD SKIP THE WORK WE WANT TO SEE
+        tbox = reasoner.normalise(ontology)
+    with PhaseMemory('saturate', results):
+        classification = reasoner.classify(tbox)
+    results['size'] = {'classes': len(tbox.concept_names()), 'axioms': tbox_size(tbox)}
+
+    # EVERYTHING SHOULD GO ONCE WE LET GO; WHATEVER DOESN'T IS A LEAK
+    with PhaseMemory('release', results):
+        del classification, tbox, ontology, reasoner
+    results['leaked'] = leaked(start)
+    return results
+
+
+def benchmark_python(axioms):
+    '''NORMALISE AND SATURATE GENERATED AXIOMS WITHOUT THE JVM (NO parse PHASE)'''
+    results = {}
+    start = leftovers()
+    with PhaseMemory('normalise', results):
+        normaliser = Normaliser()
+        for lhs, rhs in axioms:
+            normaliser.add_gci(lhs, rhs)
+        tbox = normaliser.tbox
+        del normaliser
+    with PhaseMemory('saturate', results):
+        saturation = Saturation(tbox)
+        for A in tbox.concept_names():
+            saturation.add_node(A)
+        saturation.run()
+    results['size'] = {'classes': len(tbox.concept_names()), 'axioms': tbox_size(tbox)}
+
+    with PhaseMemory('release', results):
+        del saturation, tbox
+    results['leaked'] = leaked(start)
+    return results
+
+
+def leftovers():
+    '''TRACED BYTES AND py4j PROXIES ALIVE RIGHT NOW, AFTER A FULL COLLECTION'''
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0], java_proxies()
+
+
+def leaked(start):
+    '''WHAT A BENCHMARK LEFT BEHIND COMPARED TO leftovers() BEFORE IT'''
+    traced, proxies = leftovers()
+    return {'bytes': traced - start[0], 'java_proxies': proxies - start[1]}
+
+
+def tbox_size(tbox):
+    return len(tbox.nf1) + len(tbox.nf2) + len(tbox.nf3) + len(tbox.nf4)
+
+
+def growth(runs, phase):
+    '''LEAST-SQUARES BYTES PER CLASS OF A PHASE'S PEAK OVER THE GENERATED RUNS'''
+    points = [(run['size']['classes'], run[phase]['peak_bytes']) for run in runs if phase in run]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if spread == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def report(name, results):
+    print(f"# {name}: {results['size']['classes']} classes, {results['size']['axioms']} normalised axioms")
+    print(f"  {'phase':<10} {'time':>9} {'peak':>10} {'retained':>10} {'peak RSS':>10} {'RSS +':>9} {'proxies':>8}")
+    for phase in ('parse', 'normalise', 'saturate', 'release'):
+        if phase not in results:
+            continue
+        row = results[phase]
+        print(f"  {phase:<10} {row['seconds']:>8.3f}s {row['peak_bytes'] / 2**20:>8.2f}MB "
+              f"{row['retained_bytes'] / 2**20:>8.2f}MB {row['peak_rss_kib'] / 1024:>8.1f}MB "
+              f"{row['rss_growth_kib'] / 1024:>7.1f}MB {row['java_proxies']:>8}")
+    # A FEW KB ARE INTERNED STRINGS AND FREE LISTS; PROXIES SHOULD BE EXACTLY ZERO
+    leak = results['leaked']
+    if leak['java_proxies'] > 0 or leak['bytes'] > 64 * 1024:
+        print(f"  ! not released: {leak['bytes'] / 2**20:.2f}MB, {leak['java_proxies']} py4j proxies")
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description="Peak and retained memory of parse, normalisation and saturation.")
+    arg_parser.add_argument("ontology_files", nargs="*", help="OWL files (default: the bundled ontologies)")
+    arg_parser.add_argument("--sizes", type=int, nargs="*", default=[1000, 5000, 20000], help="classes per generated ontology")
+    arg_parser.add_argument("--no-jvm", action="store_true", help="skip the OWL files and feed generated ontologies straight to the normaliser")
+    arg_parser.add_argument("--json", metavar="FILE", help="also write every measurement to FILE")
+    args = arg_parser.parse_args()
+
+    tracemalloc.start()
+    all_results = {}
+    generated = []
+
+    if not args.no_jvm:
+        ontology_files = args.ontology_files or sorted(glob.glob("*.owl") + glob.glob("ontologies/*.owl"))
+        for ontology_file in ontology_files:
+            all_results[ontology_file] = benchmark_jvm(ontology_file)
+            report(ontology_file, all_results[ontology_file])
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            name = f"generated-{size}"
+            axioms = generate_axioms(size)
+            if args.no_jvm:
+                results = benchmark_python(axioms)
+            else:
+                results = benchmark_jvm(write_owl(axioms, os.path.join(directory, name + ".owl")))
+            del axioms
+            all_results[name] = results
+            generated.append(results)
+            report(name, results)
+
+    print()
+    for phase in ('parse', 'normalise', 'saturate'):
+        slope = growth(generated, phase)
+        if slope is not None:
+            print(f"{phase}: ~{slope:.0f} bytes per class at peak")
+
+    if args.json:
+        with open(args.json, mode='w') as file:
+            json.dump(all_results, file, indent=2, sort_keys=True)
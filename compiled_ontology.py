@@ -0,0 +1,144 @@
+import mmap
+import os
+import struct
+from array import array
+
+from normal_form import NormalisedTBox
+
+# A COMPILED ONTOLOGY (.elc) IS THE NORMAL FORM AS PACKED ARRAYS:
+#   header   magic, format version, byte order mark, source sha-256,
+#            unsupported axiom count, section count
+#   table    (offset, length) of every section, in SECTIONS order
+#   sections int32 arrays, or NUL separated utf-8 strings, 8-byte aligned
+MAGIC = b'ELNF'
+FORMAT_VERSION = 2
+# WRITTEN IN THE WRITER'S NATIVE ORDER, LIKE THE INT32 SECTIONS
+BYTE_ORDER_MARK = array('i', [0x01020304]).tobytes()
+HEADER = struct.Struct('<4sHxx4s32sII')
+SECTION = struct.Struct('<QQ')
+SECTIONS = (
+    ('named', 'b'),
+    ('names', 's'),
+    ('roles', 's'),
+    ('nf1', 'i'),
+    ('nf2', 'i'),
+    ('nf3', 'i'),
+    ('nf4', 'i'),
+    ('role_inclusions', 'i'),
+    ('role_chains', 'i'),
+    ('fresh_ids', 'i'),
+    ('fresh_labels', 's'),
+)
+
+
+class CompiledFormatError(ValueError):
+    pass
+
+
+def flatten(axioms):
+    packed = array('i')
+    for axiom in axioms:
+        packed.extend(axiom)
+    return packed
+
+
+def compile_tbox(tbox, path):
+    '''WRITE A NormalisedTBox AS A .elc FILE'''
+    fresh_ids = sorted(tbox.fresh_labels)
+    payloads = {
+        'named': array('b', (1 if named else 0 for named in tbox.named)).tobytes(),
+        'names': '\0'.join(tbox.names).encode('utf-8'),
+        'roles': '\0'.join(tbox.roles).encode('utf-8'),
+        'fresh_ids': array('i', fresh_ids).tobytes(),
+        'fresh_labels': '\0'.join(tbox.fresh_labels[i] for i in fresh_ids).encode('utf-8'),
+    }
+    for name in ('nf1', 'nf2', 'nf3', 'nf4', 'role_inclusions', 'role_chains'):
+        payloads[name] = flatten(getattr(tbox, name)).tobytes()
+
+    digest = bytes.fromhex(tbox.source_hash) if tbox.source_hash else bytes(32)
+    offset = HEADER.size + SECTION.size * len(SECTIONS)
+    table = []
+    body = bytearray()
+    for name, _ in SECTIONS:
+        padding = -(offset + len(body)) % 8
+        body.extend(bytes(padding))
+        table.append((offset + len(body), len(payloads[name])))
+        body.extend(payloads[name])
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, BYTE_ORDER_MARK, digest, tbox.unsupported, len(SECTIONS)))
+        for entry in table:
+            file.write(SECTION.pack(*entry))
+        file.write(body)
+    return path
+
+
+def unflatten(ints, width):
+    return list(zip(*(ints[i::width] for i in range(width))))
+
+
+def open_compiled(path, expected_hash=None):
+    '''MAP A .elc FILE AND BUILD A NormalisedTBox FROM IT, NO JVM NEEDED'''
+    with open(path, 'rb') as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        view = memoryview(buffer)
+        if len(view) < HEADER.size:
+            raise CompiledFormatError(f"{path} is too short to be a compiled ontology")
+        magic, version, mark, digest, unsupported, count = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise CompiledFormatError(f"{path} is not a compiled ontology")
+        if version != FORMAT_VERSION or count != len(SECTIONS):
+            raise CompiledFormatError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+        swap = mark != BYTE_ORDER_MARK
+        source = digest.hex() if any(digest) else None
+        if expected_hash is not None and source != expected_hash:
+            raise CompiledFormatError(f"{path} was compiled from a different version of the ontology")
+
+        sections = {}
+        for i, (name, kind) in enumerate(SECTIONS):
+            offset, length = SECTION.unpack_from(view, HEADER.size + i * SECTION.size)
+            raw = view[offset:offset + length]
+            if kind == 's':
+                sections[name] = str(raw, 'utf-8').split('\0') if length else []
+            elif kind == 'b':
+                sections[name] = [flag == 1 for flag in raw.tobytes()]
+            elif swap:
+                ints = array('i', raw.tobytes())
+                ints.byteswap()
+                sections[name] = ints
+            else:
+                sections[name] = raw.cast('i')
+
+        tbox = NormalisedTBox()
+        tbox.names = sections['names']
+        tbox.named = sections['named']
+        tbox.roles = sections['roles']
+        tbox.rebuild_symbol_ids()
+        tbox.nf1 = unflatten(sections['nf1'], 2)
+        tbox.nf2 = unflatten(sections['nf2'], 3)
+        tbox.nf3 = unflatten(sections['nf3'], 3)
+        tbox.nf4 = unflatten(sections['nf4'], 3)
+        tbox.role_inclusions = unflatten(sections['role_inclusions'], 2)
+        tbox.role_chains = unflatten(sections['role_chains'], 3)
+        tbox.fresh_labels = dict(zip(sections['fresh_ids'], sections['fresh_labels']))
+        tbox.unsupported = unsupported
+        tbox.source_hash = source
+        # EVERYTHING IS COPIED OUT NOW, THE MAPPING CAN GO
+        del raw, sections, view
+        return tbox.build_index()
+    finally:
+        try:
+            buffer.close()
+        except BufferError:
+            # A FAILED READ CAN STILL HOLD VIEWS, THE GC UNMAPS IT LATER
+            pass
+
+
+def compiled_path(ontology_file):
+    return os.path.splitext(ontology_file)[0] + '.elc'
+
+
+def is_compiled(path):
+    with open(path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
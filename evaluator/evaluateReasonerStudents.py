@@ -1,6 +1,6 @@
 #! /usr/bin/python3.10
 
-import sys,glob,subprocess, os.path
+import sys,glob,subprocess, os.path, os, time, json, tempfile, threading, argparse
 
 testDataPath = "TestData"
 
@@ -10,9 +10,84 @@ testData = [(name+".owl", name+"-subsumers.txt") for name in
 
 print(testData)
 
-def testReasoner(reasonerPythonFile):
+def runReasoner(command, timeout):
+    # like subprocess.run, but we reap the child ourselves with wait4 so we
+    # get its own peak RSS instead of the max over all children so far
+    with tempfile.TemporaryFile() as stdoutFile, tempfile.TemporaryFile() as stderrFile:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=stdoutFile, stderr=stderrFile)
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+        try:
+            _, status, usage = os.wait4(process.pid, 0)
+        finally:
+            timer.cancel()
+        wallTime = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        timedOut = wallTime >= timeout and process.returncode < 0
+
+        stdoutFile.seek(0)
+        stderrFile.seek(0)
+        # ru_maxrss is in KiB on Linux but in bytes on macOS
+        peakRss = usage.ru_maxrss if sys.platform != "darwin" else usage.ru_maxrss // 1024
+        return stdoutFile.read(), stderrFile.read(), wallTime, peakRss, timedOut
+
+
+def loadBaseline(baselineFile):
+    if not os.path.exists(baselineFile):
+        return {}
+    with open(baselineFile) as file:
+        return json.load(file)
+
+
+def saveBaseline(baselineFile, timings):
+    with open(baselineFile, mode='w') as file:
+        json.dump(timings, file, indent=2, sort_keys=True)
+
+
+def regressionReport(baseline, timings, tolerance):
+    # an ontology regresses if its time or memory grew by more than tolerance
+    regressions = []
+    for ontologyFile in sorted(timings):
+        if ontologyFile not in baseline:
+            continue
+        for metric, unit in [("wallTime", "s"), ("peakRss", " KiB")]:
+            old = baseline[ontologyFile][metric]
+            new = timings[ontologyFile][metric]
+            if old > 0 and new > old * (1 + tolerance):
+                regressions.append((ontologyFile, metric, old, new, unit))
+
+    print()
+    print("Performance against baseline (tolerance "+str(int(tolerance*100))+"%):")
+    for ontologyFile in sorted(timings):
+        timing = timings[ontologyFile]
+        line = ontologyFile+" "+format(timing["wallTime"], ".3f")+"s "+str(timing["peakRss"])+" KiB"
+        if ontologyFile in baseline:
+            old = baseline[ontologyFile]
+            line += " (baseline "+format(old["wallTime"], ".3f")+"s "+str(old["peakRss"])+" KiB)"
+        else:
+            line += " (no baseline)"
+        if timing.get("timedOut"):
+            line += " TIMED OUT"
+        print(line)
+
+    if regressions:
+        print()
+        print("REGRESSIONS:")
+        for ontologyFile, metric, old, new, unit in regressions:
+            formatValue = (lambda x: format(x, ".3f")) if unit == "s" else str
+            print(" - "+ontologyFile+" "+metric+": "+formatValue(old)+unit+" -> "+formatValue(new)+unit
+                  +" (+"+str(int(round((new/old - 1)*100)))+"%)")
+    else:
+        print("No performance regressions.")
+
+    return regressions
+
+
+def testReasoner(reasonerPythonFile, timeout=60):
 
     results = []
+    timings = {}
 
     outputfile=open("output.out", mode='a')
 
@@ -24,9 +99,14 @@ def testReasoner(reasonerPythonFile):
 
         full_path = os.path.abspath(testDataPath+"/"+ontologyFile)
 
-        completed = subprocess.run(["python3.10", reasonerPythonFile, full_path, "A"], capture_output=True, timeout=60)
+        # an optional <name>-args.txt holds extra command line flags for that case
+        argsFile = testDataPath+"/"+ontologyFile[:-4]+"-args.txt"
+        extraArgs = open(argsFile).read().split() if os.path.exists(argsFile) else []
 
-        outputLines = set([line.strip() for line in completed.stdout.decode("utf-8").split("\n")])
+        stdout, stderr, wallTime, peakRss, timedOut = runReasoner(["python3.10", reasonerPythonFile, full_path, "A"] + extraArgs, timeout)
+        timings[ontologyFile] = {"wallTime": wallTime, "peakRss": peakRss, "timedOut": timedOut}
+
+        outputLines = set([line.strip() for line in stdout.decode("utf-8").split("\n")])
 
         print()
         print("Output:")
@@ -40,7 +120,8 @@ def testReasoner(reasonerPythonFile):
         print("Output list: "+str(outputLines))
         print()
         print("Errors:")
-        print(completed.stderr.decode("utf-8"))
+        print(stderr.decode("utf-8"))
+        print("Time: "+format(wallTime, ".3f")+"s, peak RSS: "+str(peakRss)+" KiB"+(" (timed out)" if timedOut else ""))
         print()
 
         with open(testDataPath+"/"+subsumersFile) as file:
@@ -71,7 +152,37 @@ def testReasoner(reasonerPythonFile):
 
     outputfile.close()
 
+    return results, timings
+
+
+argumentParser = argparse.ArgumentParser()
+argumentParser.add_argument("reasoner")
+argumentParser.add_argument("--baseline", default="baseline.json", help="where the timing baseline is stored")
+argumentParser.add_argument("--update-baseline", action="store_true", help="store this run as the new baseline")
+argumentParser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before it counts as a regression (0.25 = 25%%)")
+argumentParser.add_argument("--timeout", type=float, default=60)
+arguments = argumentParser.parse_args()
+
+results, timings = testReasoner(arguments.reasoner, arguments.timeout)
+
+baseline = loadBaseline(arguments.baseline)
+regressions = regressionReport(baseline, timings, arguments.tolerance)
+
+# only runs that gave the right answer in time may become the reference,
+# otherwise a timeout would be the bar nothing can ever regress against
+passed = set(name for name, success in results if success == "True")
+trusted = {name: {"wallTime": t["wallTime"], "peakRss": t["peakRss"]}
+           for name, t in timings.items() if name in passed and not t["timedOut"]}
+skipped = sorted(set(timings) - set(trusted))
 
-reasoner = sys.argv[1]
+if arguments.update_baseline or not baseline:
+    newBaseline = dict(baseline)
+    newBaseline.update(trusted)
+    if newBaseline:
+        saveBaseline(arguments.baseline, newBaseline)
+        print("Baseline written to "+arguments.baseline)
+    if skipped:
+        print("Not in the baseline (failed or timed out): "+", ".join(skipped))
 
-testReasoner(reasoner)
+if regressions:
+    sys.exit(1)
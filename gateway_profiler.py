@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+from collections import defaultdict
+
+from py4j.java_gateway import JavaGateway, JavaObject
+
+THIS_FILE = os.path.abspath(__file__)
+
+
+class GatewayProfiler:
+    '''COUNT AND TIME EVERY CALL THAT CROSSES INTO THE JVM
+
+    Wrap the gateway with wrap() and hand the wrapper to ELReasoner5000:
+    every Java object that comes back out of it is wrapped too, so all
+    calls on the factory, formatter, parser, ontologies and axioms are
+    recorded, by method name and by the line in our code that made them.
+    '''
+    def __init__(self):
+        self.by_method = defaultdict(lambda: [0, 0.0])
+        self.by_site = defaultdict(lambda: [0, 0.0])
+
+    def wrap(self, target):
+        if isinstance(target, (JavaObject, JavaGateway)):
+            return ProfiledJavaObject(target, self)
+        return target
+
+    def caller_site(self):
+        '''FIRST FRAME OUTSIDE THIS FILE: path:line function'''
+        frame = sys._getframe(2)
+        while frame is not None and os.path.abspath(frame.f_code.co_filename) == THIS_FILE:
+            frame = frame.f_back
+        if frame is None:
+            return '?'
+        return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+
+    def record(self, method, seconds):
+        stats = self.by_method[method]
+        stats[0] += 1
+        stats[1] += seconds
+        stats = self.by_site[(method, self.caller_site())]
+        stats[0] += 1
+        stats[1] += seconds
+
+    def timed(self, method, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.record(method, time.perf_counter() - start)
+
+    def total_calls(self):
+        return sum(calls for calls, _ in self.by_method.values())
+
+    def total_seconds(self):
+        return sum(seconds for _, seconds in self.by_method.values())
+
+    def report(self, top=15):
+        '''TOP OFFENDERS BY TOTAL TIME, PER METHOD AND PER CALLER'''
+        lines = [f"py4j: {self.total_calls()} calls, {self.total_seconds() * 1000:.1f} ms on the socket", "",
+                 f"{'method':<40}{'calls':>10}{'total ms':>12}{'mean µs':>12}"]
+        methods = sorted(self.by_method.items(), key=lambda item: item[1][1], reverse=True)
+        for method, (calls, seconds) in methods[:top]:
+            lines.append(f"{method:<40}{calls:>10}{seconds * 1000:>12.1f}{seconds / calls * 1e6:>12.1f}")
+
+        lines += ["", f"{'method @ caller':<70}{'calls':>10}{'total ms':>12}"]
+        sites = sorted(self.by_site.items(), key=lambda item: item[1][1], reverse=True)
+        for (method, site), (calls, seconds) in sites[:top]:
+            lines.append(f"{method + ' @ ' + site:<70}{calls:>10}{seconds * 1000:>12.1f}")
+        return "\n".join(lines)
+
+    def reset(self):
+        self.by_method.clear()
+        self.by_site.clear()
+
+
+def unwrap(value):
+    return value._target if isinstance(value, ProfiledJavaObject) else value
+
+
+class ProfiledJavaObject:
+    '''STAND-IN FOR A py4j OBJECT THAT REPORTS EVERY REMOTE CALL'''
+    __slots__ = ('_target', '_profiler')
+
+    def __init__(self, target, profiler):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_profiler', profiler)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        if not callable(value):
+            return value
+        profiler = self._profiler
+
+        def call(*args):
+            result = profiler.timed(name, value, *[unwrap(arg) for arg in args])
+            return profiler.wrap(result)
+        return call
+
+    # PYTHON PROTOCOLS THAT py4j TURNS INTO REMOTE CALLS
+    def __iter__(self):
+        iterator = iter(self._target)
+        profiler = self._profiler
+        while True:
+            try:
+                item = profiler.timed('iterator.next', next, iterator)
+            except StopIteration:
+                return
+            yield profiler.wrap(item)
+
+    def __len__(self):
+        return self._profiler.timed('size', len, self._target)
+
+    def __contains__(self, item):
+        return self._profiler.timed('contains', self._target.__contains__, unwrap(item))
+
+    def __getitem__(self, key):
+        return self._profiler.wrap(self._profiler.timed('get', self._target.__getitem__, key))
+
+    def __eq__(self, other):
+        return self._profiler.timed('equals', self._target.__eq__, unwrap(other))
+
+    def __hash__(self):
+        return self._profiler.timed('hashCode', hash, self._target)
+
+    def __str__(self):
+        return self._profiler.timed('toString', str, self._target)
+
+    def __repr__(self):
+        return f"Profiled({self._target!r})"
@@ -0,0 +1,67 @@
+from bisect import bisect_left
+
+
+def unquote(name):
+    if len(name) >= 2 and name[0] == name[-1] == '"':
+        return name[1:-1]
+    if len(name) >= 2 and name[0] == '<' and name[-1] == '>':
+        return name[1:-1]
+    return name
+
+
+def fragment(name):
+    '''THE LOCAL PART OF AN IRI: http://x.org/food#Gyoza -> Gyoza'''
+    name = unquote(name)
+    cut = max(name.rfind('#'), name.rfind('/'))
+    return name[cut + 1:] if cut >= 0 else name
+
+
+class ConceptNameIndex:
+    '''USER-FACING CLASS NAMES -> CONCEPT IDS, BUILT ONCE PER TBOX
+
+    resolve() accepts the name as the formatter prints it, without quotes,
+    as a bare IRI fragment or in any letter case, in that order of
+    preference, with one dict lookup. complete() does prefix search over a
+    sorted key list with bisect.
+    '''
+    def __init__(self, tbox):
+        self.tbox = tbox
+        self.ids = {}
+        concepts = tbox.concept_names()
+
+        # MOST SPECIFIC SPELLINGS FIRST, LATER PASSES NEVER OVERWRITE THEM
+        for spell in (lambda n: n, unquote, fragment, lambda n: unquote(n).casefold(), lambda n: fragment(n).casefold()):
+            for concept in concepts:
+                self.ids.setdefault(spell(tbox.names[concept]), concept)
+
+        keys = set()
+        for concept in concepts:
+            name = tbox.names[concept]
+            keys.add((unquote(name).casefold(), concept))
+            keys.add((fragment(name).casefold(), concept))
+        self.keys = sorted(keys)
+        self.prefixes = [key for key, _ in self.keys]
+
+    def resolve(self, name):
+        '''CONCEPT ID FOR A USER-TYPED NAME, None IF THERE'S NO SUCH CLASS'''
+        ids = self.ids
+        for key in (name, unquote(name), fragment(name)):
+            if key in ids:
+                return ids[key]
+        return ids.get(unquote(name).casefold(), ids.get(fragment(name).casefold()))
+
+    def complete(self, prefix, k=10):
+        '''UP TO k CLASS NAMES STARTING WITH prefix (CASE-INSENSITIVE), IN KEY ORDER'''
+        prefix = unquote(prefix).casefold()
+        found = []
+        seen = set()
+        i = bisect_left(self.prefixes, prefix)
+        while i < len(self.keys) and len(found) < k:
+            key, concept = self.keys[i]
+            if not key.startswith(prefix):
+                break
+            if concept not in seen:
+                seen.add(concept)
+                found.append(self.tbox.names[concept])
+            i += 1
+        return found
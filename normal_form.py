@@ -0,0 +1,477 @@
+import hashlib
+import json
+import os
+
+# CONCEPTS AS PLAIN PYTHON TERMS, NO JAVA ANYWHERE:
+#   ('top',)  ('bottom',)  ('name', 'A')  ('and', (C, D, ...))  ('some', 'r', C)
+TOP_TERM = ('top',)
+BOTTOM_TERM = ('bottom',)
+TOP = 0
+BOTTOM = 1
+
+NORMAL_FORM_VERSION = 4
+
+
+def term_to_string(term):
+    '''RENDER A TERM IN DL SYNTAX'''
+    kind = term[0]
+    if kind == 'top':
+        return '⊤'
+    if kind == 'bottom':
+        return '⊥'
+    if kind == 'name':
+        return term[1]
+    if kind == 'and':
+        return '(' + ' ⊓ '.join(term_to_string(conjunct) for conjunct in term[1]) + ')'
+    return f"∃{term[1]}.{term_to_string(term[2])}"
+
+
+def source_hash(path):
+    '''SHA-256 OF AN ONTOLOGY FILE'''
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class NormalisedTBox:
+    '''A TBOX IN EL NORMAL FORM OVER INTEGER IDS
+
+    Only four axiom shapes are left after normalisation:
+        nf1  A ⊑ B            (A, B)
+        nf2  A1 ⊓ A2 ⊑ B      (A1, A2, B)
+        nf3  A ⊑ ∃r.B         (A, r, B)
+        nf4  ∃r.A ⊑ B         (r, A, B)
+    plus role inclusions r ⊑ s (r, s) and binary role chains r1 ∘ r2 ⊑ s
+    (r1, r2, s); transitivity of r is just r ∘ r ⊑ r.
+    Concept id 0 is ⊤ and id 1 is ⊥. Fresh names introduced for complex subterms have
+    named[id] == False and never show up in results.
+    '''
+    def __init__(self):
+        self.names = ['⊤', '⊥']
+        self.named = [False, False]
+        self.name_ids = {}
+        self.roles = []
+        self.role_ids = {}
+        self.nf1 = []
+        self.nf2 = []
+        self.nf3 = []
+        self.nf4 = []
+        self.role_inclusions = []
+        self.role_chains = []
+        self.fresh_labels = {}
+        self.unsupported = 0
+        self.source_hash = None
+        self.indexed = False
+        self.relevance = {}
+
+    # SYMBOLS
+    def concept_id(self, name, named=True):
+        if name not in self.name_ids:
+            self.name_ids[name] = len(self.names)
+            self.names.append(name)
+            self.named.append(named)
+        return self.name_ids[name]
+
+    def fresh_concept(self):
+        return self.concept_id(f"_:nf{len(self.names)}", named=False)
+
+    def describe(self, concept):
+        '''PRINTABLE NAME OF A CONCEPT ID, FRESH NAMES SHOW THE TERM THEY STAND FOR'''
+        return self.fresh_labels.get(concept, self.names[concept])
+
+    def role_id(self, name):
+        if name not in self.role_ids:
+            self.role_ids[name] = len(self.roles)
+            self.roles.append(name)
+        return self.role_ids[name]
+
+    def fresh_role(self):
+        return self.role_id(f"_:rc{len(self.roles)}")
+
+    def concept_names(self):
+        '''IDS OF THE REAL (NON-FRESH) CONCEPT NAMES, IN ONTOLOGY ORDER'''
+        return [i for i, named in enumerate(self.named) if named]
+
+    def rebuild_symbol_ids(self):
+        '''name_ids AND role_ids FROM THE names AND roles LISTS (AFTER LOADING)'''
+        self.name_ids = {name: i for i, name in enumerate(self.names) if i not in (TOP, BOTTOM)}
+        self.role_ids = {name: i for i, name in enumerate(self.roles)}
+
+    def subsumer_ids(self, label):
+        '''NAMED CONCEPTS IN A SATURATED LABEL; ALL OF THEM IF THE LABEL HAS ⊥'''
+        if BOTTOM in label:
+            return self.concept_names()
+        # SORTED IDS ARE ONTOLOGY ORDER; WALKING THE LABEL KEEPS THIS O(|label|)
+        named = self.named
+        return sorted(A for A in label if named[A])
+
+    def name_index(self):
+        '''THE ConceptNameIndex OF THIS TBOX, BUILT ON FIRST USE'''
+        index = self.__dict__.get('names_by_spelling')
+        if index is None:
+            from name_index import ConceptNameIndex
+            index = self.names_by_spelling = ConceptNameIndex(self)
+        return index
+
+    # INDEXES FOR THE SATURATION
+    def build_index(self):
+        '''TURN THE AXIOM LISTS INTO LOOKUP TABLES, ONCE'''
+        self.told = {}
+        self.conj = {}
+        self.exists_rhs = {}
+        self.exists_lhs = {}
+        for A, B in self.nf1:
+            self.told.setdefault(A, []).append(B)
+        for A1, A2, B in self.nf2:
+            self.conj.setdefault(A1, {}).setdefault(A2, []).append(B)
+            if A1 != A2:
+                self.conj.setdefault(A2, {}).setdefault(A1, []).append(B)
+        for A, r, B in self.nf3:
+            self.exists_rhs.setdefault(A, []).append((r, B))
+        for r, A, B in self.nf4:
+            self.exists_lhs.setdefault(A, {}).setdefault(r, []).append(B)
+        self.build_role_index()
+        self.indexed = True
+        return self
+
+    def build_role_index(self):
+        '''PRECOMPUTE THE ROLE CLOSURE AND THE CHAIN TABLE
+
+        role_supers[r] holds every s with r ⊑* s (r included), and
+        chain_table[r1][r2] every s with r1 ∘ r2 ⊑ s, already closed under
+        the hierarchy on both sides, so the saturation only does lookups.
+        '''
+        told_supers = {}
+        for r, s in self.role_inclusions:
+            told_supers.setdefault(r, set()).add(s)
+
+        self.role_supers = {}
+        for r in range(len(self.roles)):
+            closure = {r}
+            todo = [r]
+            while todo:
+                for s in told_supers.get(todo.pop(), ()):
+                    if s not in closure:
+                        closure.add(s)
+                        todo.append(s)
+            self.role_supers[r] = tuple(closure)
+
+        subs = {}
+        for r, supers in self.role_supers.items():
+            for s in supers:
+                subs.setdefault(s, []).append(r)
+
+        self.chain_table = {}
+        for r1, r2, s in self.role_chains:
+            for sub1 in subs.get(r1, (r1,)):
+                for sub2 in subs.get(r2, (r2,)):
+                    self.chain_table.setdefault(sub1, {}).setdefault(sub2, set()).update(self.role_supers.get(s, (s,)))
+
+    def build_reverse_index(self):
+        '''WHAT EACH CONCEPT AND ROLE CAN BE DERIVED FROM
+
+        derived_by[('concept', B)] / derived_by[('role', s)] list the
+        symbols that can take part in deriving B, or an s-edge, in one step.
+        '''
+        if not self.indexed:
+            self.build_index()
+        derived_by = {}
+        def add(target, *sources):
+            derived_by.setdefault(target, []).extend(sources)
+
+        for A, B in self.nf1:
+            add(('concept', B), ('concept', A))
+        for A1, A2, B in self.nf2:
+            add(('concept', B), ('concept', A1), ('concept', A2))
+        for r, A, B in self.nf4:
+            add(('concept', B), ('concept', A), ('role', r))
+        for A, r, B in self.nf3:
+            for s in self.role_supers.get(r, (r,)):
+                add(('role', s), ('concept', A), ('concept', B))
+        for r, s in self.role_inclusions:
+            add(('role', s), ('role', r))
+        for r1, r2, s in self.role_chains:
+            add(('role', s), ('role', r1), ('role', r2))
+
+        # ⊥ ALSO TRAVELS BACK ALONG EDGES, SO ONCE IT CAN BE DERIVED AT ALL
+        # (BY AN AXIOM, OR AS THE FILLER OF A ∃r.⊥), EVERYTHING THAT BUILDS
+        # AN EDGE CAN HELP TO DERIVE IT
+        if ('concept', BOTTOM) in derived_by or any(B == BOTTOM for _, _, B in self.nf3):
+            for A, r, B in self.nf3:
+                add(('concept', BOTTOM), ('concept', A), ('concept', B),
+                    *(('role', s) for s in self.role_supers.get(r, (r,))))
+        self.derived_by = derived_by
+        return derived_by
+
+    def relevant_to(self, B):
+        '''CONCEPTS THAT CAN POSSIBLY HELP TO DERIVE B, CACHED PER B
+
+        A backward closure over the axioms: if a concept isn't in here,
+        applying rules to it can never put B into a label.
+        '''
+        if B in self.relevance:
+            return self.relevance[B]
+        derived_by = self.__dict__.get('derived_by') or self.build_reverse_index()
+
+        # DERIVING ⊥ ALSO MAKES A ⊑ B TRUE
+        seen = {('concept', B), ('concept', BOTTOM)}
+        todo = [('concept', B), ('concept', BOTTOM)]
+        while todo:
+            for source in derived_by.get(todo.pop(), ()):
+                if source not in seen:
+                    seen.add(source)
+                    todo.append(source)
+        relevant = frozenset(symbol for kind, symbol in seen if kind == 'concept')
+        self.relevance[B] = relevant
+        return relevant
+
+    def restrict(self, nf1, nf2, nf3, nf4, role_inclusions, role_chains):
+        '''SAME SYMBOL TABLE, FEWER AXIOMS (FOR MODULES)'''
+        module = NormalisedTBox.__new__(NormalisedTBox)
+        module.__dict__.update(self.__dict__)
+        module.nf1, module.nf2, module.nf3, module.nf4 = nf1, nf2, nf3, nf4
+        module.role_inclusions, module.role_chains = role_inclusions, role_chains
+        module.relevance = {}
+        for index in ('derived_by', 'waiting_on', 'module_axioms'):
+            module.__dict__.pop(index, None)
+        return module.build_index()
+
+    def build_module_index(self):
+        '''THE WHOLE-TBOX HALF OF extract_module, BUILT ONCE PER TBOX
+
+        module_axioms[i] = (shape, lhs size, rhs symbols, axiom) and
+        waiting_on[symbol] lists the axioms with symbol on their left hand
+        side. Concepts are ints, roles are ('role', id).
+        '''
+        axioms = []
+        for A, B in self.nf1:
+            axioms.append((0, (A,), (B,), (A, B)))
+        for A1, A2, B in self.nf2:
+            axioms.append((1, {A1, A2}, (B,), (A1, A2, B)))
+        for A, r, B in self.nf3:
+            axioms.append((2, (A,), (('role', r), B), (A, r, B)))
+        for r, A, B in self.nf4:
+            axioms.append((3, {('role', r), A}, (B,), (r, A, B)))
+        for r, s in self.role_inclusions:
+            axioms.append((4, (('role', r),), (('role', s),), (r, s)))
+        for r1, r2, s in self.role_chains:
+            axioms.append((5, {('role', r1), ('role', r2)}, (('role', s),), (r1, r2, s)))
+
+        waiting_on = {}
+        for i, (_, lhs, _, _) in enumerate(axioms):
+            for symbol in lhs:
+                waiting_on.setdefault(symbol, []).append(i)
+        self.module_axioms = [(shape, len(lhs), rhs, axiom) for shape, lhs, rhs, axiom in axioms]
+        self.waiting_on = waiting_on
+        return waiting_on
+
+    def extract_module(self, C0):
+        '''AXIOMS REACHABLE FROM C0 (BOTTOM-LOCALITY ON NORMAL FORMS)
+
+        An axiom joins the module once every symbol on its left hand side
+        is in the signature; its right hand side symbols then join the
+        signature. The index is shared by all queries, so a query only
+        pays for the axioms it actually touches.
+        '''
+        waiting_on = self.__dict__.get('waiting_on') or self.build_module_index()
+        axioms = self.module_axioms
+
+        # ONLY THE AXIOMS THIS QUERY TOUCHED: i -> LHS SYMBOLS STILL MISSING
+        missing = {}
+        # ⊤ IS IN EVERY LABEL, SO IT'S ALWAYS IN THE SIGNATURE
+        signature = set()
+        todo = [TOP, C0]
+        kept = ([], [], [], [], [], [])
+        while todo:
+            symbol = todo.pop()
+            if symbol in signature:
+                continue
+            signature.add(symbol)
+            for i in waiting_on.get(symbol, ()):
+                shape, size, rhs, axiom = axioms[i]
+                left = missing.get(i, size) - 1
+                missing[i] = left
+                if left == 0:
+                    kept[shape].append(axiom)
+                    todo.extend(rhs)
+        return self.restrict(*kept)
+
+    # DISK CACHE
+    def to_dict(self):
+        return {
+            'version': NORMAL_FORM_VERSION,
+            'source_hash': self.source_hash,
+            'names': self.names,
+            'named': self.named,
+            'roles': self.roles,
+            'nf1': self.nf1,
+            'nf2': self.nf2,
+            'nf3': self.nf3,
+            'nf4': self.nf4,
+            'role_inclusions': self.role_inclusions,
+            'role_chains': self.role_chains,
+            'fresh_labels': self.fresh_labels,
+            'unsupported': self.unsupported,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        tbox = cls()
+        tbox.names = data['names']
+        tbox.named = data['named']
+        tbox.roles = data['roles']
+        tbox.rebuild_symbol_ids()
+        tbox.nf1 = [tuple(axiom) for axiom in data['nf1']]
+        tbox.nf2 = [tuple(axiom) for axiom in data['nf2']]
+        tbox.nf3 = [tuple(axiom) for axiom in data['nf3']]
+        tbox.nf4 = [tuple(axiom) for axiom in data['nf4']]
+        tbox.role_inclusions = [tuple(axiom) for axiom in data['role_inclusions']]
+        tbox.role_chains = [tuple(axiom) for axiom in data['role_chains']]
+        tbox.fresh_labels = {int(concept): label for concept, label in data['fresh_labels'].items()}
+        tbox.unsupported = data.get('unsupported', 0)
+        tbox.source_hash = data['source_hash']
+        return tbox.build_index()
+
+    def save(self, path):
+        with open(path, 'w') as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, path, expected_hash=None):
+        '''LOAD A CACHED NORMAL FORM, None IF IT'S MISSING OR STALE'''
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if data.get('version') != NORMAL_FORM_VERSION:
+            return None
+        if expected_hash is not None and data.get('source_hash') != expected_hash:
+            return None
+        return cls.from_dict(data)
+
+
+def cache_path(ontology_file):
+    '''WHERE THE NORMAL FORM OF AN ONTOLOGY FILE IS CACHED'''
+    return ontology_file + '.nf.json'
+
+
+class Normaliser:
+    '''REWRITE GCIS OVER TERMS INTO THE FOUR NORMAL FORMS
+
+    Every complex subterm gets one fresh name X. When the term shows up on
+    a left hand side we add term ⊑ X, on a right hand side X ⊑ term, so
+    the fresh names are definitorial and the result is a conservative
+    extension of the input.
+    '''
+    def __init__(self, tbox=None):
+        self.tbox = tbox if tbox is not None else NormalisedTBox()
+        self.fresh = {}
+        self.defined_lhs = set()
+        self.defined_rhs = set()
+        self.seen = set()
+
+    def emit(self, shape, axiom):
+        if (shape, axiom) not in self.seen:
+            self.seen.add((shape, axiom))
+            getattr(self.tbox, shape).append(axiom)
+
+    def atom(self, term):
+        '''CONCEPT ID STANDING FOR term (A NAME, ⊤ OR A FRESH NAME)'''
+        kind = term[0]
+        if kind == 'top':
+            return TOP
+        if kind == 'bottom':
+            return BOTTOM
+        if kind == 'name':
+            return self.tbox.concept_id(term[1])
+        if term not in self.fresh:
+            self.fresh[term] = self.tbox.fresh_concept()
+            self.tbox.fresh_labels[self.fresh[term]] = term_to_string(term)
+        return self.fresh[term]
+
+    def define_lhs(self, term):
+        '''ID X WITH term ⊑ X'''
+        X = self.atom(term)
+        if term[0] in ('top', 'bottom', 'name') or term in self.defined_lhs:
+            return X
+        self.defined_lhs.add(term)
+
+        if term[0] == 'and':
+            conjuncts = term[1]
+            A = self.define_lhs(conjuncts[0])
+            for i in range(1, len(conjuncts)):
+                B = self.define_lhs(conjuncts[i])
+                # n-ARY CONJUNCTIONS BECOME A CHAIN OF BINARY ONES
+                last = i == len(conjuncts) - 1
+                C = X if last else self.atom(('and', conjuncts[:i + 1]))
+                self.emit('nf2', (A, B, C))
+                A = C
+            if len(conjuncts) == 1:
+                self.emit('nf1', (A, X))
+        elif term[0] == 'some':
+            r = self.tbox.role_id(term[1])
+            A = self.define_lhs(term[2])
+            self.emit('nf4', (r, A, X))
+        return X
+
+    def define_rhs(self, term):
+        '''ID X WITH X ⊑ term'''
+        X = self.atom(term)
+        if term[0] in ('top', 'bottom', 'name') or term in self.defined_rhs:
+            return X
+        self.defined_rhs.add(term)
+        self.include(X, term)
+        return X
+
+    def include(self, A, term):
+        '''ADD A ⊑ term'''
+        kind = term[0]
+        if kind == 'top':
+            return
+        if kind in ('name', 'bottom'):
+            B = self.atom(term)
+            if A != B:
+                self.emit('nf1', (A, B))
+        elif kind == 'and':
+            for conjunct in term[1]:
+                self.include(A, conjunct)
+        elif kind == 'some':
+            r = self.tbox.role_id(term[1])
+            B = self.define_rhs(term[2])
+            self.emit('nf3', (A, r, B))
+
+    def add_gci(self, lhs, rhs):
+        self.include(self.define_lhs(lhs), rhs)
+
+    def add_role_inclusion(self, chain, super_role):
+        '''ADD r1 ∘ ... ∘ rn ⊑ s, LONG CHAINS ARE SPLIT WITH FRESH ROLES'''
+        roles = [self.tbox.role_id(role) for role in chain]
+        s = self.tbox.role_id(super_role)
+        while len(roles) > 2:
+            fresh = self.tbox.fresh_role()
+            self.emit('role_chains', (roles[0], roles[1], fresh))
+            roles = [fresh] + roles[2:]
+        if len(roles) == 2:
+            self.emit('role_chains', (roles[0], roles[1], s))
+        elif roles[0] != s:
+            self.emit('role_inclusions', (roles[0], s))
+
+    def add_transitive_role(self, role):
+        self.add_role_inclusion([role, role], role)
+
+    def add_disjoint(self, concepts):
+        '''PAIRWISE Ci ⊓ Cj ⊑ ⊥'''
+        for i in range(len(concepts)):
+            for j in range(i + 1, len(concepts)):
+                self.add_gci(('and', (concepts[i], concepts[j])), BOTTOM_TERM)
+
+    def add_equivalence(self, concepts):
+        first = concepts[0]
+        for other in concepts[1:]:
+            self.add_gci(first, other)
+            self.add_gci(other, first)
@@ -0,0 +1,82 @@
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from py4j.java_gateway import DEFAULT_PORT, GatewayParameters, JavaGateway
+
+from compiled_ontology import is_compiled, open_compiled
+from normal_form import NormalisedTBox, cache_path, source_hash
+from reasoner_final import ELReasoner5000
+
+
+class ParallelOntologyLoader:
+    '''PARSE AND NORMALISE MANY ONTOLOGY FILES AT ONCE
+
+    Every worker borrows a JavaGateway connection of its own, so parseFile
+    and convertToBinaryConjunctions run side by side instead of queueing on
+    one socket. Connections are opened on demand, at most workers of them,
+    spread round robin over the ports (several ports, several gateway
+    JVMs), and are reused by every later load_all() until close(). What
+    comes back is plain NormalisedTBoxes, which no longer need the JVM
+    that built them.
+    '''
+    def __init__(self, ports=(DEFAULT_PORT,), connections_per_port=2, workers=None):
+        self.ports = list(ports)
+        self.workers = workers if workers is not None else len(self.ports) * connections_per_port
+        self.next_port = itertools.cycle(self.ports)
+        self.port_lock = threading.Lock()
+        self.idle = queue.Queue()
+        self.gateways = []
+
+    def acquire(self):
+        '''BORROW A REASONER (AND ITS GATEWAY CONNECTION), OPENING ONE IF THE POOL ISN'T FULL YET'''
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.port_lock:
+            port = next(self.next_port) if len(self.gateways) < self.workers else None
+            if port is not None:
+                connection = JavaGateway(gateway_parameters=GatewayParameters(port=port))
+                self.gateways.append(connection)
+        if port is None:
+            return self.idle.get()
+        return ELReasoner5000(connection)
+
+    def release(self, reasoner):
+        self.idle.put(reasoner)
+
+    def load_one(self, path):
+        '''NORMAL FORM OF ONE FILE, SKIPPING THE JVM FOR .elc FILES AND FRESH CACHES'''
+        if is_compiled(path):
+            return open_compiled(path)
+        tbox = NormalisedTBox.load(cache_path(path), source_hash(path))
+        if tbox is not None:
+            return tbox
+        reasoner = self.acquire()
+        try:
+            # THE NORMAL FORM IS ALL WE KEEP, normalise_file LETS THE JVM FORGET THE ONTOLOGY
+            return reasoner.normalise_file(path)
+        finally:
+            self.release(reasoner)
+
+    def load_all(self, paths):
+        '''{path: NormalisedTBox} FOR ALL paths, LOADED IN PARALLEL'''
+        paths = list(dict.fromkeys(paths))
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(paths)))) as pool:
+            tboxes = list(pool.map(self.load_one, paths))
+        return dict(zip(paths, tboxes))
+
+    def close(self):
+        with self.port_lock:
+            gateways, self.gateways = self.gateways, []
+            self.idle = queue.Queue()
+        for connection in gateways:
+            connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
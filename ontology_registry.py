@@ -0,0 +1,155 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+
+def approximate_size(obj, seen=None):
+    '''DEEP sys.getsizeof OVER THE CONTAINERS THE REASONER BUILDS'''
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            size += approximate_size(key, seen) + approximate_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += approximate_size(item, seen)
+    elif hasattr(obj, '__dict__'):
+        size += approximate_size(vars(obj), seen)
+    return size
+
+
+class RegistryEntry:
+    '''ONE RESIDENT ONTOLOGY: ITS NORMAL FORM AND (ONCE ASKED FOR) ITS CLASSIFICATION'''
+    def __init__(self, name, path, tbox):
+        self.name = name
+        self.path = path
+        self.tbox = tbox
+        self.classification = None
+        self.size = approximate_size(tbox)
+
+    def subsumers(self, A):
+        return self.classification.model[A]
+
+
+class OntologyRegistry:
+    '''LOAD ONTOLOGIES ON DEMAND AND KEEP THE RECENTLY USED ONES IN MEMORY
+
+    Entries are kept in least-recently-used order. Every time an entry is
+    loaded or classified its footprint is (re)estimated, and entries are
+    evicted from the cold end until the total fits under max_bytes again.
+    The entry that was just asked for is never evicted.
+    '''
+    def __init__(self, reasoner=None, max_bytes=512 * 1024 * 1024):
+        if reasoner is None:
+            from reasoner_final import ELReasoner5000
+            reasoner = ELReasoner5000()
+        self.reasoner = reasoner
+        self.max_bytes = max_bytes
+        self.sources = {}
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.RLock()
+
+    def register(self, name, path):
+        '''MAKE AN ONTOLOGY FILE KNOWN UNDER A NAME, WITHOUT LOADING IT'''
+        self.sources[name] = path
+
+    def load(self, path):
+        '''NORMAL FORM OF AN ONTOLOGY FILE (.elc, DISK CACHE OR PARSED)'''
+        return self.reasoner.load_ontology(path)
+
+    def get(self, name):
+        '''THE ENTRY FOR name (A REGISTERED NAME OR A FILE PATH), LOADING IT IF NEEDED'''
+        with self.lock:
+            if name in self.entries:
+                self.entries.move_to_end(name)
+                return self.entries[name]
+
+        path = self.sources.get(name, name)
+        if not os.path.exists(path):
+            raise KeyError(f"Unknown ontology: {name}")
+        entry = RegistryEntry(name, path, self.load(path))
+
+        with self.lock:
+            # SOMEBODY ELSE MIGHT HAVE LOADED IT IN THE MEANTIME
+            if name in self.entries:
+                self.entries.move_to_end(name)
+                return self.entries[name]
+            self.entries[name] = entry
+            self.total_bytes += entry.size
+            self.enforce_limit(keep=name)
+            return entry
+
+    def put(self, name, path, tbox):
+        '''ADD AN ALREADY NORMALISED ONTOLOGY (E.G. FROM A PARALLEL LOADER)'''
+        entry = RegistryEntry(name, path, tbox)
+        with self.lock:
+            self.sources[name] = path
+            old = self.entries.pop(name, None)
+            if old is not None:
+                self.total_bytes -= old.size
+            self.entries[name] = entry
+            self.total_bytes += entry.size
+            self.enforce_limit(keep=name)
+        return entry
+
+    def preload(self, loader, names=None):
+        '''LOAD MANY REGISTERED ONTOLOGIES AT ONCE THROUGH A ParallelOntologyLoader'''
+        names = list(self.sources) if names is None else list(names)
+        paths = [self.sources.get(name, name) for name in names]
+        loaded = loader.load_all(paths)
+        for name, path in zip(names, paths):
+            self.put(name, path, loaded[path])
+
+    def classified(self, name):
+        '''THE ENTRY FOR name WITH ITS SATURATED MODEL RESIDENT'''
+        entry = self.get(name)
+        if entry.classification is None:
+            classification = self.reasoner.classify(entry.tbox)
+            with self.lock:
+                if entry.classification is None:
+                    entry.classification = classification
+                    old_size = entry.size
+                    entry.size = approximate_size(entry.tbox) + approximate_size(classification.model) + approximate_size(classification.relations)
+                    if self.entries.get(name) is entry:
+                        self.total_bytes += entry.size - old_size
+                        self.enforce_limit(keep=name)
+        return entry
+
+    def find_all_subsumers(self, input_class, name):
+        '''SUBSUMERS OF input_class FROM THE RESIDENT CLASSIFICATION'''
+        entry = self.classified(name)
+        tbox = entry.tbox
+        A = self.reasoner.find_concept(input_class, tbox)
+        if A is None:
+            return None
+        return [tbox.names[B] for B in tbox.subsumer_ids(entry.subsumers(A))]
+
+    def evict(self, name):
+        with self.lock:
+            entry = self.entries.pop(name, None)
+            if entry is not None:
+                self.total_bytes -= entry.size
+                # OR THE REASONER'S MODULES AND SUBSUMER MEMOS KEEP IT ALIVE ANYWAY
+                self.reasoner.invalidate(entry.tbox)
+            return entry
+
+    def enforce_limit(self, keep=None):
+        '''DROP LEAST RECENTLY USED ENTRIES UNTIL WE'RE UNDER THE CEILING'''
+        with self.lock:
+            for name in list(self.entries):
+                if self.total_bytes <= self.max_bytes:
+                    break
+                if name != keep:
+                    self.evict(name)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,93 @@
+from collections import defaultdict
+
+from normal_form import BOTTOM, TOP
+from saturation import Saturation
+
+
+class ABoxSaturation(Saturation):
+    '''SATURATION OF INDIVIDUALS ON TOP OF A FINISHED CLASSIFICATION
+
+    The concept nodes of the classification are taken over as they are:
+    they are saturated already, so nothing can ever be added to them, and
+    their label sets are shared instead of copied. Only individual nodes
+    (and concept nodes the classification never needed) are worked on, and
+    an individual typed A gets all of A's precomputed subsumers in one go.
+    '''
+    def __init__(self, classification):
+        super().__init__(classification.tbox)
+        self.classified = classification.model
+        self.model = dict(classification.model)
+        self.relations = dict(classification.relations)
+        # EDGES FROM INDIVIDUALS MUSTN'T LEAK INTO THE CLASSIFICATION
+        self.predecessors = defaultdict(dict)
+
+    def add_individual(self, individual):
+        node = ('individual', individual)
+        if node not in self.model:
+            self.model[node] = set()
+            self.relations[node] = {}
+            self.add(node, TOP)
+        return node
+
+    def process(self, node, concept):
+        # SHORTCUT: EVERYTHING A ⊑ B WITH B ALREADY WORKED OUT
+        if type(node) is tuple and concept in self.classified:
+            for B in self.classified[concept]:
+                self.add(node, B)
+        super().process(node, concept)
+
+
+class Realiser:
+    '''INFERRED TYPES OF MANY INDIVIDUALS AT ONCE'''
+    def __init__(self, classification):
+        self.classification = classification
+        self.tbox = classification.tbox
+
+    def realise(self, class_assertions, role_assertions=()):
+        '''class_assertions: (individual, class) PAIRS, role_assertions: (subject, role, object)
+
+        Returns {individual: [inferred types]}. Names the ontology doesn't
+        know end up in self.unknown instead of raising.
+        '''
+        tbox = self.tbox
+        index = tbox.name_index()
+        saturation = ABoxSaturation(self.classification)
+        self.unknown = set()
+
+        for individual, class_name in class_assertions:
+            node = saturation.add_individual(individual)
+            A = index.resolve(class_name)
+            if A is None:
+                self.unknown.add(class_name)
+                continue
+            saturation.add(node, A)
+
+        for subject, role_name, target in role_assertions:
+            node = saturation.add_individual(subject)
+            other = saturation.add_individual(target)
+            role = tbox.role_ids.get(role_name)
+            if role is None:
+                self.unknown.add(role_name)
+                continue
+            saturation.link(node, role, other)
+
+        saturation.run()
+        self.saturation = saturation
+        return {node[1]: [tbox.names[A] for A in tbox.subsumer_ids(label)]
+                for node, label in saturation.model.items() if type(node) is tuple}
+
+    def inconsistent_individuals(self):
+        '''INDIVIDUALS OF THE LAST realise() THAT ENDED UP WITH ⊥'''
+        return [node[1] for node, label in self.saturation.model.items() if type(node) is tuple and BOTTOM in label]
+
+    def most_specific_types(self, types):
+        '''DROP EVERY TYPE THAT IS A STRICT SUBSUMER OF ANOTHER TYPE IN THE LIST'''
+        index = self.tbox.name_index()
+        model = self.classification.model
+        ids = [index.resolve(name) for name in types]
+        strict_ancestors = set()
+        for A in ids:
+            for B in model[A]:
+                if B != A and A not in model.get(B, ()):
+                    strict_ancestors.add(B)
+        return [self.tbox.names[A] for A in ids if A not in strict_ancestors]
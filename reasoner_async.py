@@ -0,0 +1,77 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class _InFlight:
+    '''ONE RUNNING QUERY AND HOW MANY CALLERS ARE WAITING ON IT'''
+    def __init__(self, future, cancel):
+        self.future = future
+        self.cancel = cancel
+        self.waiters = 0
+
+
+class AsyncELReasoner:
+    '''ASYNCIO FRONT FOR ELReasoner5000
+
+    Reasoning runs on an executor so the event loop keeps serving. Identical
+    queries that arrive while one is still running share its future, and a
+    query is only cancelled once every caller waiting on it has given up;
+    a query that is already running is then stopped cooperatively through
+    its cancel event.
+    '''
+    def __init__(self, reasoner=None, executor=None, max_workers=4):
+        if reasoner is None:
+            from reasoner_final import ELReasoner5000
+            reasoner = ELReasoner5000()
+        self.reasoner = reasoner
+        self.owns_executor = executor is None
+        self.executor = executor if executor is not None else ThreadPoolExecutor(max_workers=max_workers)
+        self.in_flight = {}
+
+    async def _coalesced(self, key, function, *args, cancellable=False):
+        loop = asyncio.get_running_loop()
+        entry = self.in_flight.get(key)
+        if entry is None:
+            cancel = threading.Event()
+            call = (lambda: function(*args, cancel=cancel)) if cancellable else (lambda: function(*args))
+            entry = _InFlight(loop.run_in_executor(self.executor, call), cancel)
+            self.in_flight[key] = entry
+
+            def forget(_, key=key, entry=entry):
+                if self.in_flight.get(key) is entry:
+                    del self.in_flight[key]
+            entry.future.add_done_callback(forget)
+
+        entry.waiters += 1
+        try:
+            # shield(): ONE CALLER GIVING UP MUSTN'T CANCEL IT FOR THE OTHERS
+            return await asyncio.shield(entry.future)
+        finally:
+            entry.waiters -= 1
+            if entry.waiters == 0 and not entry.future.done():
+                entry.cancel.set()
+                entry.future.cancel()
+
+    async def normalise(self, ontology):
+        '''NORMAL FORM OF AN ONTOLOGY, COMPUTED ONCE EVEN UNDER CONCURRENT CALLS'''
+        key = ('normalise', self.reasoner.ontology_key(ontology))
+        return await self._coalesced(key, self.reasoner.normalise, ontology)
+
+    async def find_all_subsumers(self, input_class, ontology, timeout=None, max_steps=None):
+        '''SAME AS ELReasoner5000.find_all_subsumers, WITHOUT BLOCKING THE LOOP'''
+        tbox = await self.normalise(ontology)
+        # DIFFERENT BUDGETS CAN GIVE DIFFERENT (PARTIAL) ANSWERS, SO THEY DON'T SHARE
+        key = ('subsumers', self.reasoner.ontology_key(ontology), input_class, timeout, max_steps)
+        return await self._coalesced(key, self.reasoner.find_all_subsumers, input_class, tbox, timeout, max_steps,
+                                     cancellable=True)
+
+    def close(self):
+        if self.owns_executor:
+            self.executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
@@ -1,185 +1,580 @@
 from py4j.java_gateway import JavaGateway
+from py4j.protocol import Py4JError
 import sys
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import networkx as nx
-import matplotlib.pyplot as plt
 import matplotlib
 matplotlib.use('Agg')
+from matplotlib.figure import Figure
+
+from normal_form import BOTTOM, BOTTOM_TERM, NormalisedTBox, Normaliser, TOP, TOP_TERM, cache_path, source_hash
+from saturation import Budget, Saturation, TracingSaturation
+from compiled_ontology import compile_tbox, compiled_path, is_compiled, open_compiled
+from realisation import Realiser
+from taxonomy import AncestorIndex
+from subsumption_matrix import SubsumptionMatrix
 
 gateway = JavaGateway()
 
+
+def render_subsumers_graph(input_class, subsumers, output_file=None):
+    '''DRAW THE SUBSUMERS OF input_class AND SAVE THEM AS A PNG'''
+    if output_file is None:
+        output_file = f"{input_class}_subsumers.png"
+
+    G = nx.DiGraph()
+    G.add_node(input_class, color="red", size=3000)
+
+    for subsumer in subsumers:
+        G.add_node(subsumer, color="#ADD8E6", size=2000)
+        G.add_edge(subsumer, input_class)
+
+    pos = nx.spring_layout(G)
+    node_colors = [G.nodes[node]['color'] for node in G.nodes]
+    node_sizes = [G.nodes[node]['size'] for node in G.nodes]
+
+    # NO PYPLOT HERE: A PLAIN Figure IS SAFE TO BUILD ON A WORKER THREAD
+    fig = Figure(figsize=(10, 8))
+    ax = fig.add_subplot()
+    nx.draw(G, pos, ax=ax, with_labels=True, node_color=node_colors, node_size=node_sizes, edge_color="black")
+    ax.set_title(f"Subsumers of {input_class}")
+    fig.savefig(output_file)
+    return output_file
+
+
+class SubsumerGraphRenderer:
+    '''RENDER GRAPHS IN THE BACKGROUND SO THE TEXT RESULTS DON'T HAVE TO WAIT'''
+    def __init__(self, workers=1, processes=False, max_pending=16):
+        # processes=True RENDERS BATCHES IN PARALLEL WITHOUT FIGHTING OVER THE GIL
+        executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+        self.executor = executor_class(max_workers=workers)
+        # BOUNDED QUEUE: submit() BLOCKS ONCE max_pending GRAPHS ARE WAITING
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.futures = []
+
+    def submit(self, input_class, subsumers, output_file=None):
+        '''QUEUE ONE GRAPH, RETURNS A FUTURE WITH THE PNG PATH'''
+        if not subsumers:
+            print(f"No subsumers found for {input_class}.")
+            return None
+
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(render_subsumers_graph, input_class, list(subsumers), output_file)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        self.futures.append(future)
+        return future
+
+    def wait(self):
+        '''BLOCK UNTIL EVERY QUEUED GRAPH IS WRITTEN, RETURNS THE PNG PATHS'''
+        futures, self.futures = self.futures, []
+        return [future.result() for future in futures]
+
+    def close(self, wait=True):
+        '''FLUSH (OR DROP) WHAT'S LEFT AND STOP THE WORKERS'''
+        try:
+            if wait:
+                return self.wait()
+            for future in self.futures:
+                future.cancel()
+            self.futures = []
+            return []
+        finally:
+            self.executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(wait=exc_type is None)
+
+class Subsumers(list):
+    '''A LIST OF SUBSUMERS THAT KNOWS WHETHER IT'S ALL OF THEM
+
+    complete is False when the reasoning budget ran out first: every name
+    in the list is a real subsumer, but some may be missing.
+    '''
+    def __init__(self, names, complete=True):
+        super().__init__(names)
+        self.complete = complete
+
+
+class LRUCache:
+    '''A SMALL THREAD-SAFE LEAST-RECENTLY-USED DICT'''
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            if key not in self.entries:
+                return default
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def drop(self, matches):
+        '''FORGET EVERY ENTRY WHOSE KEY MATCHES'''
+        with self.lock:
+            for key in [key for key in self.entries if matches(key)]:
+                del self.entries[key]
+
+    def __len__(self):
+        return len(self.entries)
+
 # 😎
 class ELReasoner5000: 
-    def __init__(self):
-        # JAVA STUFF
-        self.elFactory = gateway.getELFactory()
-        self.formatter = gateway.getSimpleDLFormatter()
-        self.parser = gateway.getOWLParser()
+    def __init__(self, java_gateway=None, max_ontologies=16, max_results=4096):
+        # JAVA STUFF (ANY GATEWAY WILL DO, THE MODULE ONE BY DEFAULT)
+        self.gateway = java_gateway if java_gateway is not None else gateway
+        self.java_objects = {}
+
+        # MEMOS: NORMAL FORM PER ONTOLOGY, MODULE AND SUBSUMERS PER (ONTOLOGY, CONCEPT)
+        self.normal_forms = LRUCache(max_ontologies)
+        self.modules = LRUCache(max_results)
+        self.subsumer_cache = LRUCache(max_results)
+        self.ancestor_indexes = LRUCache(max_ontologies)
+        self.converted = set()
+
+    # ASKED FOR ON FIRST USE, SO A COMPILED ONTOLOGY NEVER TOUCHES THE JVM
+    def java_object(self, getter):
+        if getter not in self.java_objects:
+            self.java_objects[getter] = getattr(self.gateway, getter)()
+        return self.java_objects[getter]
+
+    @property
+    def elFactory(self):
+        return self.java_object('getELFactory')
+
+    @property
+    def formatter(self):
+        return self.java_object('getSimpleDLFormatter')
+
+    @property
+    def parser(self):
+        return self.java_object('getOWLParser')
 
     def get_the_box(self, ontology):
         '''GET THE Tbox FROM THE ONTOLOGY'''
-        gateway.convertToBinaryConjunctions(ontology)
+        # CONVERTING TWICE DOES NOTHING BUT COST A ROUND TRIP
+        key = self.ontology_key(ontology)
+        if key not in self.converted:
+            self.gateway.convertToBinaryConjunctions(ontology)
+            self.converted.add(key)
         return ontology.tbox()
     
     def get_axiom_type(self, axiom): 
         '''FIND OUT WHAT KIND OF AXIOM IT IS'''
         return axiom.getClass().getSimpleName()
 
-    def convert_tbox_to_subsumers(self, tbox):
-        ''' ABOUT SUBSUMERS? '''
-        new_tbox = []
-        axioms = tbox.getAxioms()
+    def concept_to_term(self, concept):
+        '''JAVA CONCEPT -> PYTHON TERM (None IF IT ISN'T EL)'''
+        concept_type = self.get_axiom_type(concept)
+        if concept_type == "ConceptName":
+            return ('name', self.formatter.format(concept))
+        if concept_type == "TopConcept$":
+            return TOP_TERM
+        if concept_type == "BottomConcept$":
+            return BOTTOM_TERM
+        if concept_type == "ConceptConjunction":
+            conjuncts = tuple(self.concept_to_term(conjunct) for conjunct in concept.getConjuncts())
+            if None in conjuncts:
+                return None
+            return ('and', conjuncts)
+        if concept_type == "ExistentialRoleRestriction":
+            filler = self.concept_to_term(concept.filler())
+            if filler is None:
+                return None
+            return ('some', self.formatter.format(concept.role()), filler)
+        return None
+
+    def role_chain(self, role):
+        '''A ROLE OR A ROLE CHAIN -> LIST OF ROLE NAMES'''
+        if self.get_axiom_type(role) == "RoleChain":
+            return [self.formatter.format(r) for r in role.getRoles()]
+        return [self.formatter.format(role)]
+
+    def get_role_axioms(self, ontology):
+        '''ROLE AXIOMS LIVE IN THE RBOX, IF THE ONTOLOGY HAS ONE'''
+        try:
+            return list(ontology.rbox().getAxioms())
+        except Py4JError:
+            return []
 
-        for axiom in axioms: 
+    def convert_tbox_to_subsumers(self, tbox, concept_names=(), role_axioms=()):
+        ''' NORMALISE THE TBOX, ONLY A ⊑ B, A1 ⊓ A2 ⊑ B, A ⊑ ∃r.B AND ∃r.A ⊑ B ARE LEFT '''
+        normaliser = Normaliser()
+        # CONCEPT NAMES FIRST, SO THEIR IDS FOLLOW THE ONTOLOGY ORDER
+        for concept in concept_names:
+            normaliser.tbox.concept_id(self.formatter.format(concept))
+
+        for axiom in list(tbox.getAxioms()) + list(role_axioms): 
             axiom_type = self.get_axiom_type(axiom)
-            if axiom_type == 'EquivalenceAxiom': 
-                concepts = axiom.getConcepts()
-                A = concepts[0]
-                B = concepts[1]
-                gci1 = self.elFactory.getGCI(A, B)
-                gci2 = self.elFactory.getGCI(B, A)
-                new_tbox.append(gci1)
-                new_tbox.append(gci2)
-            else: 
-                new_tbox.append(axiom)
-
-        top = self.elFactory.getTop()
-        new_tbox.append(top)
-        return new_tbox
+            if axiom_type in ('RoleInclusion', 'RoleChainInclusion', 'ComplexRoleInclusion'):
+                normaliser.add_role_inclusion(self.role_chain(axiom.lhs()), self.formatter.format(axiom.rhs()))
+                continue
+            elif axiom_type in ('TransitiveRoleAxiom', 'TransitivityAxiom'):
+                normaliser.add_transitive_role(self.formatter.format(axiom.role()))
+                continue
+            elif axiom_type in ('DisjointnessAxiom', 'DisjointClassesAxiom'):
+                concepts = [self.concept_to_term(concept) for concept in axiom.getConcepts()]
+                if None not in concepts:
+                    normaliser.add_disjoint(concepts)
+                    continue
+            elif axiom_type == 'EquivalenceAxiom': 
+                concepts = [self.concept_to_term(concept) for concept in axiom.getConcepts()]
+                if None not in concepts:
+                    normaliser.add_equivalence(concepts)
+                    continue
+            elif axiom_type == 'GeneralConceptInclusion':
+                lhs = self.concept_to_term(axiom.lhs())
+                rhs = self.concept_to_term(axiom.rhs())
+                if lhs is not None and rhs is not None:
+                    normaliser.add_gci(lhs, rhs)
+                    continue
+            normaliser.tbox.unsupported += 1
+
+        return normaliser.tbox.build_index()
+
+    def normalise(self, ontology, source=None, memoise=True):
+        '''NORMAL FORM OF AN ONTOLOGY, CACHED ON DISK NEXT TO source IF GIVEN
+
+        memoise=False skips the in-memory memo, for ontologies nobody will
+        ever ask about again (their key could never be looked up or dropped).
+        '''
+        if isinstance(ontology, NormalisedTBox):
+            return ontology
+        key = self.ontology_key(ontology)
+        tbox = self.normal_forms.get(key)
+        if tbox is not None:
+            return tbox
+
+        digest = None
+        if source is not None:
+            digest = source_hash(source)
+            cached = NormalisedTBox.load(cache_path(source), digest)
+            if cached is not None:
+                if memoise:
+                    self.normal_forms.put(key, cached)
+                return cached
+
+        tbox = self.convert_tbox_to_subsumers(self.get_the_box(ontology), ontology.getConceptNames(), self.get_role_axioms(ontology))
+        if source is not None:
+            tbox.source_hash = digest
+            try:
+                tbox.save(cache_path(source))
+            except OSError:
+                pass
+        if memoise:
+            self.normal_forms.put(key, tbox)
+        return tbox
+
+    def normalise_file(self, ontology_file):
+        '''PARSE AN OWL FILE, NORMALISE IT AND LET THE JVM FORGET THE PARSED ONTOLOGY
+
+        The Java ontology never leaves this method, so nothing about it is
+        memoised: the normal form is all that's left, keyed by source hash.
+        '''
+        ontology = self.parser.parseFile(ontology_file)
+        try:
+            return self.normalise(ontology, source=ontology_file, memoise=False)
+        finally:
+            self.converted.discard(self.ontology_key(ontology))
+            self.gateway.detach(ontology)
+
+    def load_ontology(self, ontology_file):
+        '''A COMPILED .elc FILE, A FRESH CACHED NORMAL FORM, OR PARSE THE OWL FILE'''
+        if is_compiled(ontology_file):
+            return open_compiled(ontology_file)
+        # A CACHED NORMAL FORM MEANS WE DON'T EVEN HAVE TO PARSE
+        tbox = NormalisedTBox.load(cache_path(ontology_file), source_hash(ontology_file))
+        if tbox is None:
+            tbox = self.normalise_file(ontology_file)
+        return tbox
+
+    def compile(self, ontology_file, output_file=None):
+        '''OWL FILE -> .elc FILE THAT LOADS WITHOUT XML OR THE JVM'''
+        tbox = self.normalise_file(ontology_file)
+        return compile_tbox(tbox, output_file or compiled_path(ontology_file))
+
+    def ontology_key(self, ontology):
+        '''SOMETHING HASHABLE THAT STAYS THE SAME FOR ONE ONTOLOGY'''
+        if isinstance(ontology, NormalisedTBox):
+            # WITHOUT A HASH THE OBJECT ITSELF IS THE KEY, SO A RECYCLED id() CAN'T MIX THEM UP
+            return ontology.source_hash if ontology.source_hash is not None else ontology
+        return getattr(ontology, '_target_id', id(ontology))
+
+    def invalidate(self, ontology):
+        '''FORGET EVERYTHING MEMOISED FOR AN ONTOLOGY'''
+        key = self.ontology_key(ontology)
+        self.normal_forms.drop(lambda cached: cached == key)
+        self.modules.drop(lambda cached: cached[0] == key)
+        self.subsumer_cache.drop(lambda cached: cached[0] == key)
+        self.ancestor_indexes.drop(lambda cached: cached == key)
+        self.converted.discard(key)
+
+    def add_axiom(self, ontology, axiom):
+        '''ADD AN AXIOM TO A JAVA ONTOLOGY AND DROP WHAT WAS CACHED FOR IT'''
+        ontology.addStatement(axiom)
+        self.invalidate(ontology)
+
+    def remove_axiom(self, ontology, axiom):
+        '''REMOVE AN AXIOM FROM A JAVA ONTOLOGY AND DROP WHAT WAS CACHED FOR IT'''
+        ontology.remove(axiom)
+        self.invalidate(ontology)
+
+    def extract_module(self, C0, ontology, tbox):
+        '''ONLY THE AXIOMS REACHABLE FROM C0, CACHED PER CONCEPT'''
+        key = (self.ontology_key(ontology), C0)
+        module = self.modules.get(key)
+        if module is None:
+            module = tbox.extract_module(C0)
+            self.modules.put(key, module)
+        return module
 
     def get_concepts_in_ontology(self, ontology):
         '''GIMMIE ALL CONCEPTS IN  ONTOLOGY'''
         return ontology.getConceptNames()
     
-    def check_if_subsumed(self, C0, concept_names, tbox):
+    def check_if_subsumed(self, C0, tbox, budget=None):
         '''IS C0 BEING SUBSUMED BY ANOTHER CONCEPT D0?'''
-        model = {'d0': {C0}} 
-        relations = {'d0': dict()} 
-   
-        changed = True
-        while changed:
-            changed = False
-            new_copy = list(model.items())
-            for node, assigned in new_copy:
-                
-                # RULES, RULES, RULES! APPLY THEM ALL!
-                for axiom in tbox:
-                    axiom_type = self.get_axiom_type(axiom)
-                    if axiom_type == "GeneralConceptInclusion":
-                        if axiom.lhs() in assigned and axiom.rhs() not in assigned:
-                            assigned.add(axiom.rhs())
-                            changed = True
-                
-                top = self.elFactory.getTop()
-                if top not in assigned:
-                    assigned.add(top)
-                    changed = True
-
-                for concept in concept_names:
-                    concept_type = self.get_axiom_type(concept)
-                    
-                    if concept_type == "ConceptConjunction":
-                        conjuncts = concept.getConjuncts()
-                        A = conjuncts[0]
-                        B =  conjuncts[1]
-                        if A in assigned and B in assigned and concept not in assigned:
-                            assigned.add(concept)
-                            changed = True
-
-                # EXCITING STUFF: EXISTENTIAL RULES!
-                if node in relations:
-                    for role, successors in list(relations[node].items()):
-                        for successor in list(successors):
-                            for elem in set(model[successor]):
-                                if elem !=  self.elFactory.getTop() and self.get_axiom_type(elem)=="ConceptName":
-                                    rolerestriction = self.elFactory.getExistentialRoleRestriction(role, elem)
-                                    if rolerestriction not in model[node]:
-                                        model[node].add(rolerestriction)
-                                        changed = True
-            
-                for concept in set(assigned):
-                    concept_type = self.get_axiom_type(concept)
-                    
-                    if concept_type == "ConceptConjunction":
-                        conjuncts= concept.getConjuncts()
-                        A = conjuncts[0]
-                        B =  conjuncts[1]
-
-                        # APPLY AND RULE 1!
-                        if A not in assigned:
-                            assigned.add(A)
-                            changed = True
-                            
-                        if B not in assigned:
-                            assigned.add(B)
-                            changed = True
-
-                    if concept_type == "ExistentialRoleRestriction":
-                        role = concept.role()
-                        filler = concept.filler()
-                        element_found = False
-                        
-                        for element, assignments in new_copy:  
-                            if filler in assignments:
-                                element_found = True
-                                if node not in relations:
-                                    relations[node] = {}
-
-                                if role not in relations[node]:
-                                    relations[node][role] = set()
-
-                                if element not in relations[node][role]:
-                                    relations[node][role].add(element)
-                                    changed = True
-                                      
-                        if not element_found:
-                            new_index = len(model)
-                            new_node = f'd{new_index}'
-
-                            if node not in relations:
-                                relations[node] = {}
-
-                            if role not in relations[node]:
-                                relations[node][role] = set()
-
-                            relations[node][role].add(new_node)
-                            model[new_node] = {filler}  
-                            changed = True  
-  
-                if changed:
-                    break
-    
-        return model, relations     
-
-    def find_all_subsumers(self, input_class, ontology):
-        '''FIND ALL THE SUBSUMERS OF A SPECIFIC CLASS'''
-        tbox = self.get_the_box(ontology)
-        tbox = self.convert_tbox_to_subsumers(tbox)
-
-        subsumers = []
-        concept_names = ontology.getConceptNames()
-        top = self.formatter.format(self.elFactory.getTop())
-        
-        first_concept = self.formatter.format(concept_names.iterator().next())
-        if ("\"" in first_concept) & ("\"" not in input_class):
-            C0 = self.elFactory.getConceptName('"' + input_class + '"')
-        else:
-            C0 = self.elFactory.getConceptName(input_class)
+        saturation = Saturation(tbox)
+        saturation.add_node(C0)
+        saturation.run(budget)
+        return saturation.model, saturation.relations
+
+    def classify(self, ontology, budget=None):
+        '''SATURATE EVERY CONCEPT NAME AT ONCE, model[A] ARE THE SUBSUMERS OF A
+
+        With a budget, check .complete on the result before trusting it.
+        '''
+        tbox = self.normalise(ontology)
+        saturation = Saturation(tbox)
+        for A in tbox.concept_names():
+            saturation.add_node(A)
+        return saturation.run(budget)
+
+    def unsatisfiable_classes(self, ontology, classification=None):
+        '''EVERY CLASS WITH ⊥ IN ITS LABEL, STRAIGHT OUT OF ONE CLASSIFICATION'''
+        if classification is None:
+            classification = self.classify(ontology)
+        tbox = classification.tbox
+        return [tbox.names[A] for A in tbox.concept_names() if BOTTOM in classification.model[A]]
+
+    def get_abox_assertions(self, ontology):
+        '''(individual, class) AND (subject, role, object) ASSERTIONS OF A JAVA ONTOLOGY'''
+        class_assertions = []
+        role_assertions = []
+        try:
+            assertions = list(ontology.abox().getAssertions())
+        except Py4JError:
+            return class_assertions, role_assertions
+        for assertion in assertions:
+            assertion_type = self.get_axiom_type(assertion)
+            if assertion_type == "ConceptAssertion":
+                concept = assertion.concept()
+                # ONLY NAMED TYPES, THE CLASSIFICATION HAS NOTHING PRECOMPUTED FOR THE REST
+                if self.get_axiom_type(concept) == "ConceptName":
+                    class_assertions.append((self.formatter.format(assertion.individual()), self.formatter.format(concept)))
+            elif assertion_type == "RoleAssertion":
+                role_assertions.append((self.formatter.format(assertion.individual1()),
+                                        self.formatter.format(assertion.role()),
+                                        self.formatter.format(assertion.individual2())))
+        return class_assertions, role_assertions
+
+    def realise(self, ontology, class_assertions, role_assertions=(), classification=None, most_specific=False):
+        '''INFERRED TYPES OF EVERY INDIVIDUAL IN ONE BATCH: {individual: [classes]}'''
+        if classification is None:
+            classification = self.classify(ontology)
+        realiser = Realiser(classification)
+        types = realiser.realise(class_assertions, role_assertions)
+        if most_specific:
+            types = {individual: realiser.most_specific_types(names) for individual, names in types.items()}
+        return types
+
+    def ancestor_index(self, ontology):
+        '''THE AncestorIndex OF AN ONTOLOGY, ONE CLASSIFICATION PER ONTOLOGY'''
+        key = self.ontology_key(ontology)
+        index = self.ancestor_indexes.get(key)
+        if index is None:
+            index = AncestorIndex(self.classify(ontology))
+            self.ancestor_indexes.put(key, index)
+        return index
+
+    def common_subsumers(self, classes, ontology, least=False):
+        '''NAMED CLASSES SUBSUMING ALL OF classes, ONLY THE MOST SPECIFIC ONES IF least
+
+        None if one of the names is unknown; an empty list means only ⊤.
+        '''
+        tbox = self.normalise(ontology)
+        concepts = [self.find_concept(input_class, tbox) for input_class in classes]
+        if None in concepts:
+            return None
+        index = self.ancestor_index(ontology)
+        found = index.least_common_subsumers(concepts) if least else index.common_subsumers(concepts)
+        return [tbox.names[A] for A in found]
+
+    def least_common_subsumers(self, classes, ontology):
+        '''WHAT DO THESE CLASSES HAVE IN COMMON, AS SPECIFIC AS IT GETS'''
+        return self.common_subsumers(classes, ontology, least=True)
+
+    def subsumption_matrix(self, ontology):
+        '''THE FULL INFERRED SUBSUMPTION RELATION AS A SubsumptionMatrix (CSR)'''
+        return SubsumptionMatrix(self.ancestor_index(ontology))
+
+    def find_concept(self, input_class, tbox):
+        '''ID OF input_class: QUOTED OR NOT, IRI FRAGMENT OR ANY CASE WILL DO'''
+        return tbox.name_index().resolve(input_class)
+
+    def complete_class_name(self, prefix, ontology, k=10):
+        '''AUTOCOMPLETE: UP TO k CLASS NAMES STARTING WITH prefix'''
+        return self.normalise(ontology).name_index().complete(prefix, k)
+
+    def find_all_subsumers(self, input_class, ontology, timeout=None, max_steps=None, cancel=None, budget=None):
+        '''FIND ALL THE SUBSUMERS OF A SPECIFIC CLASS
+
+        timeout (seconds), max_steps (rule applications) or a set cancel
+        event, or a ready-made budget, stop the saturation early; the
+        result then has complete=False.
+        '''
+        tbox = self.normalise(ontology)
+
+        C0 = self.find_concept(input_class, tbox)
+        if C0 is not None: 
+            key = (self.ontology_key(ontology), C0)
+            subsumers = self.subsumer_cache.get(key)
+            if subsumers is not None:
+                return Subsumers(tbox.names[D0] for D0 in subsumers)
+
+            if budget is None and (timeout is not None or max_steps is not None or cancel is not None):
+                budget = Budget(timeout, max_steps, cancel)
+
+            # ONLY SATURATE WHAT C0 CAN ACTUALLY REACH
+            module = self.extract_module(C0, ontology, tbox)
+            saturation = Saturation(module)
+            saturation.add_node(C0)
+            saturation.run(budget)
+            subsumers = tuple(tbox.subsumer_ids(saturation.model[C0]))
+            complete = saturation.complete
+            saturation.release()
+
+            # HALF-FINISHED ANSWERS NEVER GO IN THE CACHE
+            if complete:
+                self.subsumer_cache.put(key, subsumers)
+            return Subsumers((tbox.names[D0] for D0 in subsumers), complete)
 
-        if C0 in concept_names: 
-            model, relations = self.check_if_subsumed(C0, concept_names, tbox)
-            found_top = False
-            for D0 in concept_names: 
-                if D0 in model['d0']:
-                    subsumers.append(self.formatter.format(D0))
-                elif not found_top:
-                    D0 = self.elFactory.getTop()
-                    if D0 in model['d0']:
-                        subsumers.append(self.formatter.format(D0))
-                        found_top = True
-            subsumers = [subsum for subsum in subsumers if subsum != self.formatter.format(self.elFactory.getTop())]
 
-            return subsumers
+    def iter_subsumers(self, input_class, ontology, budget=None):
+        '''YIELD THE SUBSUMERS OF A CLASS WHILE THE SATURATION FINDS THEM
 
+        If the budget runs out the generator just stops; budget.exhausted
+        then says the names so far may not be all of them.
+        '''
+        tbox = self.normalise(ontology)
+
+        C0 = self.find_concept(input_class, tbox)
+        if C0 is None:
+            return
+        subsumers = self.subsumer_cache.get((self.ontology_key(ontology), C0))
+        if subsumers is not None:
+            for D0 in subsumers:
+                yield tbox.names[D0]
+            return
+        module = self.extract_module(C0, ontology, tbox)
+        reported = set()
+        for D0 in Saturation(module).derive(C0, budget):
+            if D0 == BOTTOM:
+                # UNSATISFIABLE: EVERYTHING ELSE IS A SUBSUMER TOO
+                for D1 in tbox.concept_names():
+                    if D1 not in reported:
+                        yield tbox.names[D1]
+                return
+            if tbox.named[D0]:
+                reported.add(D0)
+                yield tbox.names[D0]
+
+    def is_subsumed(self, class_a, class_b, ontology, budget=None):
+        '''IS class_a ⊑ class_b? STOPS THE MOMENT class_b SHOWS UP
+
+        None if a name is unknown, or if the budget ran out before either
+        class_b turned up or the saturation finished.
+        '''
+        tbox = self.normalise(ontology)
+
+        A = self.find_concept(class_a, tbox)
+        B = self.find_concept(class_b, tbox)
+        if A is None or B is None:
+            return None
+        if A == B:
+            return True
+        subsumers = self.subsumer_cache.get((self.ontology_key(ontology), A))
+        if subsumers is not None:
+            return B in subsumers
+
+        # SKIP EVERY RULE THAT CAN'T POSSIBLY LEAD TO B
+        module = self.extract_module(A, ontology, tbox)
+        saturation = Saturation(module, tbox.relevant_to(B))
+        for D0 in saturation.derive(A, budget):
+            if D0 == B or D0 == BOTTOM:
+                return True
+        return False if saturation.complete else None
+
+    def explain(self, class_a, class_b, ontology, budget=None):
+        '''PROOF TREE FOR class_a ⊑ class_b, None IF IT DOESN'T HOLD
+
+        Runs a separate tracing saturation, so find_all_subsumers and
+        is_subsumed stay as fast as ever. None is also what you get when
+        the budget ran out first (check budget.exhausted).
+        '''
+        tbox = self.normalise(ontology)
+
+        A = self.find_concept(class_a, tbox)
+        B = self.find_concept(class_b, tbox)
+        if A is None or B is None:
+            return None
+        module = self.extract_module(A, ontology, tbox)
+        saturation = TracingSaturation(module, tbox.relevant_to(B))
+        for D0 in saturation.derive(A, budget):
+            if D0 == B or D0 == BOTTOM:
+                return saturation.proof((A, D0))
+        return None
+
+    def format_proof(self, proof, tbox, indent=0):
+        '''PROOF -> INDENTED LINES, CONCLUSION FIRST
+
+        A fact used more than once is spelled out the first time only,
+        later uses point back up to it.
+        '''
+        lines = []
+        shown = set()
+        stack = [(proof, indent)]
+        while stack:
+            (fact, rule, premises), depth = stack.pop()
+            if len(fact) == 2:
+                text = f"{tbox.describe(fact[0])} ⊑ {tbox.describe(fact[1])}"
+            else:
+                text = f"{tbox.describe(fact[0])} ⊑ ∃{tbox.roles[fact[1]]}.{tbox.describe(fact[2])}"
+            if fact in shown:
+                lines.append('  ' * depth + f"{text}   [see above]")
+                continue
+            shown.add(fact)
+            lines.append('  ' * depth + f"{text}   [{rule}]")
+            # REVERSED, SO THE FIRST PREMISE COMES OFF THE STACK FIRST
+            stack.extend((premise, depth + 1) for premise in reversed(premises))
+        return lines
 
     def show_subsumers_graph(self, input_class, subsumers):
         '''VISUALIZATIONSE'''
@@ -187,37 +582,131 @@ class ELReasoner5000:
             print(f"No subsumers found for {input_class}.")
             return
 
-        G = nx.DiGraph()
-        G.add_node(input_class, color="red", size=3000)
+        render_subsumers_graph(input_class, subsumers)
 
-        for subsumer in subsumers:
-            G.add_node(subsumer, color="#ADD8E6", size=2000)
-            G.add_edge(subsumer, input_class)
+# Running it..
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == 'compile':
+        compile_parser = argparse.ArgumentParser(prog=f"{sys.argv[0]} compile", description="Compile an OWL file into a binary .elc ontology.")
+        compile_parser.add_argument("ontology_file")
+        compile_parser.add_argument("-o", "--output", help="where to write the .elc file (default: next to the ontology)")
+        compile_args = compile_parser.parse_args(sys.argv[2:])
+        print(ELReasoner5000().compile(compile_args.ontology_file, compile_args.output))
+        sys.exit(0)
 
-        pos = nx.spring_layout(G)
-        node_colors = [G.nodes[node]['color'] for node in G.nodes]
-        node_sizes = [G.nodes[node]['size'] for node in G.nodes]
+    arg_parser = argparse.ArgumentParser(description="Find all subsumers of a class with the EL completion algorithm.")
+    arg_parser.add_argument("ontology_file")
+    arg_parser.add_argument("classes", nargs="*", help="one class, or several for a batch run")
+    arg_parser.add_argument("--complete", metavar="PREFIX", help="list class names starting with PREFIX")
+    arg_parser.add_argument("--check", metavar="SUPERCLASS", help="only answer whether each class is subsumed by SUPERCLASS")
+    arg_parser.add_argument("--explain", metavar="SUPERCLASS", help="print a proof of class ⊑ SUPERCLASS")
+    arg_parser.add_argument("--lcs", action="store_true", help="print the most specific classes subsuming all the given classes")
+    arg_parser.add_argument("--matrix", metavar="FILE", help="write the whole subsumption relation as a sparse .npz matrix")
+    arg_parser.add_argument("--unsatisfiable", action="store_true", help="list every unsatisfiable class")
+    arg_parser.add_argument("--profile-gateway", action="store_true", help="count and time every py4j call, report on stderr")
+    arg_parser.add_argument("--backend", default="el5000", choices=["el5000", "elk", "hermit", "auto"], help="which engine computes the subsumers")
+    arg_parser.add_argument("--timeout", type=float, help="give up on a class after this many seconds and print what was found so far")
+    arg_parser.add_argument("--max-steps", type=int, help="give up on a class after this many rule applications")
+    arg_parser.add_argument("--stream", action="store_true", help="print subsumers as soon as they are derived")
+    arg_parser.add_argument("--no-graph", action="store_true", help="don't render the subsumer graphs")
+    arg_parser.add_argument("--render-workers", type=int, default=1, help="graphs rendered in parallel")
+    arg_parser.add_argument("--render-processes", action="store_true", help="render on processes instead of threads")
+    args = arg_parser.parse_args()
+    if not args.classes and args.complete is None and not args.unsatisfiable and args.matrix is None:
+        arg_parser.error("give at least one class")
 
-        plt.figure(figsize=(10, 8))
-        nx.draw(G, pos, with_labels=True, node_color=node_colors, node_size=node_sizes, edge_color="black")
-        plt.title(f"Subsumers of {input_class}")
-        plt.savefig(f"{input_class}_subsumers.png")
+    profiler = None
+    if args.profile_gateway:
+        from gateway_profiler import GatewayProfiler
+        profiler = GatewayProfiler()
+    reasoner = ELReasoner5000(profiler.wrap(gateway) if profiler else None)
+    if args.backend == "el5000":
+        ontology = reasoner.load_ontology(args.ontology_file)
+        backend = None
+    else:
+        # THE JAVA ENGINES NEED THE PARSED ONTOLOGY ITSELF
+        from reasoning_backends import make_backend
+        backend = make_backend(args.backend, reasoner)
+        if is_compiled(args.ontology_file):
+            ontology = reasoner.load_ontology(args.ontology_file)
+        else:
+            ontology = reasoner.parser.parseFile(args.ontology_file)
 
-# Running it..
-if __name__ == '__main__':
-    ontology_file = str(sys.argv[1])
-    C0 = str(sys.argv[2])
+    if args.unsatisfiable:
+        for name in reasoner.unsatisfiable_classes(ontology):
+            print(name)
 
-    reasoner = ELReasoner5000()
-    
-    ontology = reasoner.parser.parseFile(ontology_file)
-    gateway.convertToBinaryConjunctions(ontology)
-    concept_names = ontology.getConceptNames()
+    if args.complete is not None:
+        for name in reasoner.complete_class_name(args.complete, ontology):
+            print(name)
+
+    if args.matrix is not None:
+        matrix = reasoner.subsumption_matrix(ontology)
+        print(f"{matrix.save_npz(args.matrix)}: {matrix.shape[0]} classes, {len(matrix)} subsumptions")
+
+    if args.lcs and len(args.classes) < 2:
+        arg_parser.error("--lcs needs at least two classes")
+
+    budgeted = args.timeout is not None or args.max_steps is not None
+    if budgeted and args.backend in ("elk", "hermit"):
+        print(f"the {args.backend} backend can't be interrupted, --timeout and --max-steps are ignored", file=sys.stderr)
+    incomplete = "reasoning budget ran out, the answer may be incomplete"
+
+    renderer = None if args.no_graph else SubsumerGraphRenderer(args.render_workers, args.render_processes)
+    try:
+        if args.lcs:
+            common = reasoner.least_common_subsumers(args.classes, ontology)
+            if common is None:
+                print("Unknown class among " + ", ".join(args.classes), file=sys.stderr)
+                sys.exit(1)
+            # NOTHING MORE SPECIFIC IN COMMON THAN ⊤, SPELLED THE WAY THE NORMAL FORM SPELLS IT
+            for name in common or [reasoner.normalise(ontology).names[TOP]]:
+                print(name)
 
-    tbox = reasoner.get_the_box(ontology)
-    subsumers = reasoner.find_all_subsumers(C0, ontology)
-    if subsumers != None:
-        for subsumer in subsumers:
-            print(subsumer)
+        for C0 in [] if args.lcs else args.classes:
+            # A FRESH BUDGET PER CLASS, ONE SLOW CLASS MUSTN'T STARVE THE REST OF A BATCH
+            budget = Budget(args.timeout, args.max_steps) if budgeted else None
+            if args.explain is not None:
+                proof = reasoner.explain(C0, args.explain, ontology, budget)
+                if proof is None and budget is not None and budget.exhausted:
+                    print(f"{C0} ⊑ {args.explain} undecided: {incomplete}")
+                elif proof is None:
+                    print(f"{C0} ⊑ {args.explain} does not follow")
+                else:
+                    print("\n".join(reasoner.format_proof(proof, reasoner.normalise(ontology))))
+                continue
+            if args.check is not None:
+                print(f"{C0} {reasoner.is_subsumed(C0, args.check, ontology, budget)}")
+                if budget is not None and budget.exhausted:
+                    print(f"{C0}: {incomplete}", file=sys.stderr)
+                continue
+            if len(args.classes) > 1:
+                print(f"# {C0}")
+            if args.stream:
+                subsumers = []
+                for subsumer in reasoner.iter_subsumers(C0, ontology, budget):
+                    print(subsumer, flush=True)
+                    subsumers.append(subsumer)
+                if budget is not None and budget.exhausted:
+                    print(f"{C0}: {incomplete}", file=sys.stderr)
+            else:
+                if backend is not None:
+                    subsumers = backend.subsumers(C0, ontology, budget)
+                else:
+                    subsumers = reasoner.find_all_subsumers(C0, ontology, budget=budget)
+                if getattr(subsumers, 'complete', True) is False:
+                    print(f"{C0}: {incomplete}", file=sys.stderr)
+            if subsumers != None:
+                if not args.stream:
+                    for subsumer in subsumers:
+                        print(subsumer)
+                # TEXT FIRST, PICTURES LATER
+                sys.stdout.flush()
 
-        reasoner.show_subsumers_graph(C0, subsumers)
+                if renderer is not None:
+                    renderer.submit(C0, subsumers)
+    finally:
+        if renderer is not None:
+            renderer.close()
+        if profiler is not None:
+            print(profiler.report(), file=sys.stderr)
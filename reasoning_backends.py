@@ -0,0 +1,211 @@
+import time
+from collections import defaultdict
+
+from normal_form import BOTTOM, NormalisedTBox
+
+
+class OntologyStats:
+    '''SIZE AND EXPRESSIVITY OF AN ONTOLOGY, FOR PICKING A BACKEND
+
+    from_tbox() reads everything off a normal form. from_java() only asks
+    the JVM for a few collection sizes, so it costs three round trips
+    however big the ontology is, but can't tell existentials, ⊥ or
+    untranslatable axioms apart (those stay None).
+    '''
+    def __init__(self, concept_names, axioms, role_axioms, existentials=None, uses_bottom=None, unsupported=None):
+        self.concept_names = concept_names
+        self.axioms = axioms
+        self.existentials = existentials
+        self.role_axioms = role_axioms
+        self.uses_bottom = uses_bottom
+        # AXIOMS WE COULDN'T TRANSLATE: SOMETHING OUTSIDE WHAT THE EL ENGINES HANDLE
+        self.unsupported = unsupported
+
+    @classmethod
+    def from_tbox(cls, tbox):
+        return cls(concept_names=len(tbox.concept_names()),
+                   axioms=len(tbox.nf1) + len(tbox.nf2) + len(tbox.nf3) + len(tbox.nf4),
+                   role_axioms=len(tbox.role_inclusions) + len(tbox.role_chains),
+                   existentials=len(tbox.nf3) + len(tbox.nf4),
+                   uses_bottom=any(B == BOTTOM for _, B in tbox.nf1) or any(B == BOTTOM for _, _, B in tbox.nf2),
+                   unsupported=tbox.unsupported)
+
+    @classmethod
+    def from_java(cls, reasoner, ontology):
+        return cls(concept_names=ontology.getConceptNames().size(),
+                   axioms=ontology.tbox().getAxioms().size(),
+                   role_axioms=len(reasoner.get_role_axioms(ontology)))
+
+    def __repr__(self):
+        return (f"OntologyStats(concept_names={self.concept_names}, axioms={self.axioms}, "
+                f"existentials={self.existentials}, role_axioms={self.role_axioms}, unsupported={self.unsupported})")
+
+
+class ReasoningBackend:
+    '''ONE subsumers()/classify() API, WHATEVER ENGINE DOES THE WORK
+
+    subsumers(input_class, ontology, budget=None) -> [class names] or None for an unknown class
+    (only the in-house engine can be stopped by a saturation Budget)
+    classify(ontology) -> {class name: [subsumer names]}
+    Every call is timed into self.timings (calls, seconds) per operation.
+    '''
+    name = None
+
+    def __init__(self, reasoner):
+        self.reasoner = reasoner
+        self.timings = defaultdict(lambda: [0, 0.0])
+
+    def timed(self, operation, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            stats = self.timings[operation]
+            stats[0] += 1
+            stats[1] += time.perf_counter() - start
+
+    def subsumers(self, input_class, ontology, budget=None):
+        return self.timed('subsumers', self.compute_subsumers, input_class, ontology, budget)
+
+    def classify(self, ontology):
+        return self.timed('classify', self.compute_classification, ontology)
+
+
+class InHouseBackend(ReasoningBackend):
+    '''THE PYTHON COMPLETION ALGORITHM OF ELReasoner5000'''
+    name = 'el5000'
+
+    def compute_subsumers(self, input_class, ontology, budget=None):
+        return self.reasoner.find_all_subsumers(input_class, ontology, budget=budget)
+
+    def compute_classification(self, ontology):
+        classification = self.reasoner.classify(ontology)
+        tbox = classification.tbox
+        return {tbox.names[A]: [tbox.names[B] for B in tbox.subsumer_ids(classification.model[A])]
+                for A in tbox.concept_names()}
+
+
+class JavaBackend(ReasoningBackend):
+    '''A REASONER ON THE OTHER SIDE OF THE GATEWAY, NEEDS A JAVA ONTOLOGY'''
+    getter = None
+
+    def __init__(self, reasoner):
+        super().__init__(reasoner)
+        self.java_reasoner = None
+        self.current = None
+        self.name_tables = {}
+
+    def use(self, ontology):
+        if isinstance(ontology, NormalisedTBox):
+            raise TypeError(f"the {self.name} backend needs a parsed ontology, not a normal form")
+        if self.java_reasoner is None:
+            self.java_reasoner = getattr(self.reasoner.gateway, self.getter)()
+        key = self.reasoner.ontology_key(ontology)
+        if self.current != key:
+            self.java_reasoner.setOntology(ontology)
+            self.current = key
+        return self.java_reasoner
+
+    def names(self, concepts):
+        formatter = self.reasoner.formatter
+        top = formatter.format(self.reasoner.elFactory.getTop())
+        return [name for name in (formatter.format(concept) for concept in concepts) if name != top]
+
+    def name_table(self, ontology):
+        '''A NormalisedTBox WITH THE CLASS NAMES AND NO AXIOMS, FOR RESOLVING USER-TYPED NAMES
+
+        One format() per class instead of walking every axiom through the
+        gateway, which is the whole point of handing big ontologies to Java.
+        '''
+        key = self.reasoner.ontology_key(ontology)
+        table = self.name_tables.get(key)
+        if table is None:
+            table = NormalisedTBox()
+            formatter = self.reasoner.formatter
+            for concept in ontology.getConceptNames():
+                table.concept_id(formatter.format(concept))
+            # ONE ONTOLOGY AT A TIME, LIKE THE JAVA REASONER ITSELF
+            self.name_tables = {key: table}
+        return table
+
+    def compute_subsumers(self, input_class, ontology, budget=None):
+        java_reasoner = self.use(ontology)
+        names = self.name_table(ontology)
+        A = self.reasoner.find_concept(input_class, names)
+        if A is None:
+            return None
+        concept = self.reasoner.elFactory.getConceptName(names.names[A])
+        return self.names(java_reasoner.getSubsumers(concept))
+
+    def compute_classification(self, ontology):
+        classification = self.use(ontology).classify()
+        formatter = self.reasoner.formatter
+        return {formatter.format(concept): self.names(subsumers) for concept, subsumers in classification.items()}
+
+
+class ELKBackend(JavaBackend):
+    name = 'elk'
+    getter = 'getELKReasoner'
+
+
+class HermiTBackend(JavaBackend):
+    name = 'hermit'
+    getter = 'getHermiTReasoner'
+
+
+class AutoBackend(ReasoningBackend):
+    '''PICK A BACKEND PER ONTOLOGY FROM ITS OntologyStats
+
+    Big ontologies go to ELK, judged from Java-side sizes alone so they are
+    never normalised in Python. Smaller ones are normalised (in-house would
+    do that anyway): anything we couldn't translate goes to HermiT, the
+    rest stays in-house. A normal form without its Java ontology (a
+    compiled .elc, say) can only ever go in-house.
+    '''
+    name = 'auto'
+
+    def __init__(self, reasoner, large_axioms=20000):
+        super().__init__(reasoner)
+        self.large_axioms = large_axioms
+        self.backends = {backend.name: backend for backend in
+                         (InHouseBackend(reasoner), ELKBackend(reasoner), HermiTBackend(reasoner))}
+        self.stats = {}
+
+    def statistics(self, ontology):
+        key = self.reasoner.ontology_key(ontology)
+        if key not in self.stats:
+            stats = OntologyStats.from_java(self.reasoner, ontology)
+            if stats.axioms < self.large_axioms:
+                stats = OntologyStats.from_tbox(self.reasoner.normalise(ontology))
+            self.stats[key] = stats
+        return self.stats[key]
+
+    def select(self, ontology):
+        if isinstance(ontology, NormalisedTBox):
+            return self.backends['el5000']
+        stats = self.statistics(ontology)
+        if stats.unsupported:
+            return self.backends['hermit']
+        if stats.axioms >= self.large_axioms:
+            return self.backends['elk']
+        return self.backends['el5000']
+
+    def compute_subsumers(self, input_class, ontology, budget=None):
+        return self.select(ontology).subsumers(input_class, ontology, budget)
+
+    def compute_classification(self, ontology):
+        return self.select(ontology).classify(ontology)
+
+    def backend_timings(self):
+        '''{backend: {operation: (calls, seconds)}} FOR EVERY BACKEND THAT WAS USED'''
+        return {name: {operation: tuple(stats) for operation, stats in backend.timings.items()}
+                for name, backend in self.backends.items() if backend.timings}
+
+
+BACKENDS = {backend.name: backend for backend in (InHouseBackend, ELKBackend, HermiTBackend, AutoBackend)}
+
+
+def make_backend(name, reasoner):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}, pick one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](reasoner)
@@ -0,0 +1,257 @@
+import time
+from collections import deque
+
+from normal_form import BOTTOM, TOP
+
+
+class Budget:
+    '''HOW LONG A SATURATION MAY RUN: SECONDS, RULE APPLICATIONS, OR UNTIL cancel IS SET
+
+    The clock and the cancel event are only looked at every check_every
+    steps, so a budget costs next to nothing per rule application. Once
+    spent, exhausted stays True, so whoever handed the budget out can tell
+    an answer (or a generator that just stopped) is incomplete.
+    '''
+    def __init__(self, timeout=None, max_steps=None, cancel=None, check_every=256):
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.max_steps = max_steps
+        self.cancel = cancel
+        self.check_every = check_every
+        self.steps = 0
+        self.exhausted = False
+
+    def spend(self):
+        '''COUNT ONE STEP, True IF THE BUDGET IS GONE'''
+        self.steps += 1
+        if self.max_steps is not None and self.steps > self.max_steps:
+            self.exhausted = True
+        elif self.steps % self.check_every == 0:
+            if self.cancel is not None and self.cancel.is_set():
+                self.exhausted = True
+            elif self.deadline is not None and time.monotonic() >= self.deadline:
+                self.exhausted = True
+        return self.exhausted
+
+
+class Saturation:
+    '''EL COMPLETION OVER A NormalisedTBox
+
+    One node per initial concept: model[X] is the label of the element
+    that stands for concept X, relations[X][r] its r-successors. Every
+    derived fact (node, concept) and edge (node, role, successor) goes on
+    a worklist and each rule is a dict lookup, since normalisation left
+    only the four simple shapes plus the precomputed role tables.
+
+    Every rule hands add()/add_edge() the rule name and its premises; they
+    are ignored here, TracingSaturation records them.
+    '''
+    def __init__(self, tbox, relevant=None):
+        if not tbox.indexed:
+            tbox.build_index()
+        self.tbox = tbox
+        # IF GIVEN, ONLY THESE CONCEPTS FIRE RULES (SEE NormalisedTBox.relevant_to)
+        self.relevant = relevant
+        self.model = {}
+        self.relations = {}
+        self.predecessors = {}
+        self.todo = deque()
+        # False ONCE A Budget RAN OUT: EVERYTHING DERIVED IS STILL SOUND
+        self.complete = True
+
+    def add_node(self, node):
+        '''MAKE SURE THERE IS AN ELEMENT FOR CONCEPT node'''
+        if node not in self.model:
+            self.model[node] = set()
+            self.relations[node] = {}
+            self.predecessors[node] = {}
+            self.add(node, node, 'init')
+            self.add(node, TOP, 'top')
+
+    def add(self, node, concept, rule=None, premises=()):
+        label = self.model[node]
+        if concept not in label:
+            label.add(concept)
+            self.todo.append((node, concept))
+
+    def link(self, node, role, successor, rule='∃-right', premises=()):
+        '''node -r-> successor, AND THE SAME FOR EVERY SUPER-ROLE OF r'''
+        self.add_edge(node, role, successor, rule, premises)
+        super_roles = self.tbox.role_supers.get(role)
+        if super_roles and len(super_roles) > 1:
+            edge = (node, role, successor)
+            for super_role in super_roles:
+                if super_role != role:
+                    self.add_edge(node, super_role, successor, 'role inclusion', (edge,))
+
+    def add_edge(self, node, role, successor, rule=None, premises=()):
+        successors = self.relations[node].setdefault(role, set())
+        if successor in successors:
+            return False
+        successors.add(successor)
+        self.add_node(successor)
+        self.predecessors[successor].setdefault(role, set()).add(node)
+        self.todo.append((node, role, successor))
+        return True
+
+    def process_edge(self, node, role, successor):
+        tbox = self.tbox
+        edge = (node, role, successor)
+
+        # AN UNSATISFIABLE SUCCESSOR MAKES THE NODE UNSATISFIABLE TOO
+        if BOTTOM in self.model[successor]:
+            self.add(node, BOTTOM, '⊥', (edge, (successor, BOTTOM)))
+
+        # ∃r.A ⊑ B FOR EVERYTHING THE SUCCESSOR ALREADY KNOWS
+        for concept in list(self.model[successor]):
+            for B in tbox.exists_lhs.get(concept, {}).get(role, ()):
+                self.add(node, B, '∃-left', (edge, (successor, concept)))
+
+        if not tbox.chain_table:
+            return
+
+        # r ∘ s ⊑ t: node -r-> successor -s-> next
+        after = tbox.chain_table.get(role)
+        if after:
+            for next_role, nexts in list(self.relations[successor].items()):
+                for chained in after.get(next_role, ()):
+                    for next_node in list(nexts):
+                        self.add_edge(node, chained, next_node, 'role chain', (edge, (successor, next_role, next_node)))
+
+        # s ∘ r ⊑ t: previous -s-> node -r-> successor
+        for previous_role, previous in list(self.predecessors[node].items()):
+            for chained in tbox.chain_table.get(previous_role, {}).get(role, ()):
+                for previous_node in list(previous):
+                    self.add_edge(previous_node, chained, successor, 'role chain', ((previous_node, previous_role, node), edge))
+
+    def process(self, node, concept):
+        if self.relevant is not None and concept not in self.relevant:
+            return
+        tbox = self.tbox
+        label = self.model[node]
+        fact = (node, concept)
+
+        # A ⊑ B
+        for B in tbox.told.get(concept, ()):
+            self.add(node, B, '⊑', (fact,))
+
+        # A1 ⊓ A2 ⊑ B
+        for other, Bs in tbox.conj.get(concept, {}).items():
+            if other in label:
+                for B in Bs:
+                    self.add(node, B, '⊓', (fact, (node, other)))
+
+        # A ⊑ ∃r.B
+        for role, B in tbox.exists_rhs.get(concept, ()):
+            self.link(node, role, B, '∃-right', (fact,))
+
+        # ⊥ TRAVELS BACK ALONG EVERY EDGE
+        if concept == BOTTOM:
+            for role, predecessors in self.predecessors[node].items():
+                for predecessor in list(predecessors):
+                    self.add(predecessor, BOTTOM, '⊥', ((predecessor, role, node), fact))
+
+        # ∃r.A ⊑ B, LOOKING BACK AT THE PREDECESSORS
+        by_role = tbox.exists_lhs.get(concept)
+        if by_role:
+            for role, predecessors in self.predecessors[node].items():
+                for B in by_role.get(role, ()):
+                    for predecessor in list(predecessors):
+                        self.add(predecessor, B, '∃-left', ((predecessor, role, node), fact))
+
+    def out_of_budget(self, budget):
+        if budget is not None and budget.spend():
+            self.complete = False
+            return True
+        return False
+
+    def release(self):
+        '''DROP THE MODEL, E.G. AFTER A PARTIAL RUN NOBODY WILL CONTINUE'''
+        self.model = {}
+        self.relations = {}
+        self.predecessors = {}
+        self.todo.clear()
+
+    def run(self, budget=None):
+        '''APPLY RULES UNTIL NOTHING CHANGES (OR THE BUDGET RUNS OUT)'''
+        todo = self.todo
+        while todo:
+            if budget is not None and self.out_of_budget(budget):
+                break
+            item = todo.popleft()
+            if len(item) == 2:
+                self.process(*item)
+            else:
+                self.process_edge(*item)
+        return self
+
+    def derive(self, root, budget=None):
+        '''LIKE run(), BUT YIELD EACH CONCEPT AS IT ENTERS THE LABEL OF root
+
+        Every label entry goes through the worklist exactly once, so this
+        needs no extra bookkeeping and never yields the same concept twice.
+        '''
+        self.add_node(root)
+        todo = self.todo
+        while todo:
+            if budget is not None and self.out_of_budget(budget):
+                return
+            item = todo.popleft()
+            if len(item) == 2:
+                if item[0] == root:
+                    yield item[1]
+                self.process(*item)
+            else:
+                self.process_edge(*item)
+
+
+class TracingSaturation(Saturation):
+    '''Saturation THAT REMEMBERS WHY EVERY FACT WAS DERIVED
+
+    proofs[fact] = (rule, premises) for the first derivation of each fact,
+    where a fact is (node, concept) or (node, role, successor). Premises
+    are always derived before their conclusion, so following them back
+    gives a finite proof. The rules are Saturation's own; only add() and
+    add_edge() differ, so the plain Saturation never pays for this.
+    '''
+    def __init__(self, tbox, relevant=None):
+        super().__init__(tbox, relevant)
+        self.proofs = {}
+
+    def add(self, node, concept, rule=None, premises=()):
+        label = self.model[node]
+        if concept not in label:
+            label.add(concept)
+            self.proofs[(node, concept)] = (rule, premises)
+            self.todo.append((node, concept))
+
+    def add_edge(self, node, role, successor, rule=None, premises=()):
+        # RECORDED BEFORE add_edge, WHICH MAY DERIVE MORE FACTS ABOUT successor
+        edge = (node, role, successor)
+        if edge in self.proofs:
+            return False
+        self.proofs[edge] = (rule, premises)
+        return super().add_edge(node, role, successor)
+
+    def proof(self, fact):
+        '''THE PROOF OF A FACT: (fact, rule, [SUBPROOFS])
+
+        Built bottom-up with an explicit stack, so long derivation chains
+        can't hit the recursion limit, and every fact gets exactly one
+        subproof object that all its uses share: a DAG, not a tree that
+        copies shared premises into every branch.
+        '''
+        done = {}
+        stack = [fact]
+        while stack:
+            current = stack[-1]
+            if current in done:
+                stack.pop()
+                continue
+            rule, premises = self.proofs[current]
+            missing = [premise for premise in premises if premise not in done]
+            if missing:
+                stack.extend(missing)
+                continue
+            stack.pop()
+            done[current] = (current, rule, [done[premise] for premise in premises])
+        return done[fact]
@@ -0,0 +1,77 @@
+import threading
+
+from reasoner_final import ELReasoner5000
+
+
+class ReasonerSnapshot:
+    '''ONE ONTOLOGY, FULLY CLASSIFIED AND NEVER CHANGED AGAIN
+
+    Everything a query needs is computed up front (normal form, name index,
+    subsumer sets), so any number of threads can read it without locks and
+    without going near py4j.
+    '''
+    def __init__(self, tbox, classification):
+        self.tbox = tbox
+        self.index = tbox.name_index()
+        self.concepts = tuple(tbox.concept_names())
+        # AN UNSATISFIABLE CLASS IS SUBSUMED BY EVERYTHING
+        self.subsumers = {A: frozenset(tbox.subsumer_ids(classification.model[A])) for A in self.concepts}
+
+    def find_all_subsumers(self, input_class):
+        A = self.index.resolve(input_class)
+        if A is None:
+            return None
+        label = self.subsumers[A]
+        return [self.tbox.names[B] for B in self.concepts if B in label]
+
+    def is_subsumed(self, class_a, class_b):
+        A = self.index.resolve(class_a)
+        B = self.index.resolve(class_b)
+        if A is None or B is None:
+            return None
+        return B in self.subsumers[A]
+
+
+class SharedReasoner:
+    '''A REASONER ONE WHOLE THREAD POOL CAN QUERY AT ONCE
+
+    Readers grab the current ReasonerSnapshot (a single attribute read) and
+    query it lock-free. reload() builds a complete new snapshot on the side
+    and swaps it in, so a query sees either the old ontology or the new one,
+    never a mix. Reloads are serialised, and they are the only place the
+    wrapped ELReasoner5000 (and with it py4j) is used.
+    '''
+    def __init__(self, ontology_file, reasoner=None):
+        self.reasoner = reasoner if reasoner is not None else ELReasoner5000()
+        self.ontology_file = ontology_file
+        self.reload_lock = threading.Lock()
+        self.current = None
+        self.reload()
+
+    def build(self, ontology_file):
+        tbox = self.reasoner.load_ontology(ontology_file)
+        return ReasonerSnapshot(tbox, self.reasoner.classify(tbox))
+
+    def reload(self, ontology_file=None):
+        '''(RE)LOAD THE ONTOLOGY AND SWAP IT IN ATOMICALLY'''
+        with self.reload_lock:
+            if ontology_file is not None:
+                self.ontology_file = ontology_file
+            snapshot = self.build(self.ontology_file)
+            previous, self.current = self.current, snapshot
+            # THE OLD SNAPSHOT OWNS ITS DATA; DON'T LET THE REASONER'S MEMOS PIN A SECOND COPY
+            if previous is not None:
+                key = self.reasoner.ontology_key(previous.tbox)
+                if key != self.reasoner.ontology_key(snapshot.tbox):
+                    self.reasoner.invalidate(previous.tbox)
+        return snapshot
+
+    def snapshot(self):
+        '''THE CURRENT SNAPSHOT; HOLD ON TO IT TO ASK SEVERAL CONSISTENT QUESTIONS'''
+        return self.current
+
+    def find_all_subsumers(self, input_class):
+        return self.current.find_all_subsumers(input_class)
+
+    def is_subsumed(self, class_a, class_b):
+        return self.current.is_subsumed(class_a, class_b)
@@ -0,0 +1,68 @@
+from array import array
+
+
+class SubsumptionMatrix:
+    '''THE WHOLE INFERRED HIERARCHY AS A CLASS × CLASS CSR MATRIX
+
+    Row i, column j is 1 when names[i] ⊑ names[j] (so the diagonal is
+    full). Rows and columns follow the order of tbox.concept_names(), which
+    only depends on the ontology, and index[name] maps back. indptr and
+    indices are filled as machine ints straight from the AncestorIndex
+    bitsets, so no Python object is made per pair; numpy and scipy are
+    only needed to hand them out as arrays.
+    '''
+    def __init__(self, ancestor_index):
+        tbox = ancestor_index.tbox
+        self.names = [tbox.names[A] for A in ancestor_index.concept_ids]
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.indptr = array('i', [0])
+        self.indices = array('i')
+
+        indices = self.indices
+        for A in ancestor_index.concept_ids:
+            mask = ancestor_index.ancestors[A]
+            # LOWEST BIT FIRST, SO EVERY ROW COMES OUT SORTED
+            while mask:
+                low = mask & -mask
+                indices.append(low.bit_length() - 1)
+                mask ^= low
+            self.indptr.append(len(indices))
+
+    @property
+    def shape(self):
+        return (len(self.names), len(self.names))
+
+    def __len__(self):
+        '''NUMBER OF SUBSUMPTIONS (NON-ZEROS)'''
+        return len(self.indices)
+
+    def arrays(self):
+        '''(indptr, indices, data) AS NUMPY ARRAYS, THE FIRST TWO WITHOUT A COPY'''
+        import numpy
+        indptr = numpy.frombuffer(self.indptr, dtype=numpy.intc)
+        indices = numpy.frombuffer(self.indices, dtype=numpy.intc)
+        return indptr, indices, numpy.ones(len(indices), dtype=numpy.int8)
+
+    def csr(self):
+        '''A scipy.sparse.csr_matrix'''
+        from scipy.sparse import csr_matrix
+        indptr, indices, data = self.arrays()
+        return csr_matrix((data, indices, indptr), shape=self.shape)
+
+    def save_npz(self, path):
+        '''WRITE A .npz THAT scipy.sparse.load_npz READS, WITH THE CLASS NAMES UNDER "names"
+
+        Only needs numpy, the layout is the one scipy.sparse.save_npz uses.
+        '''
+        import numpy
+        indptr, indices, data = self.arrays()
+        numpy.savez_compressed(path, format=b'csr', shape=numpy.array(self.shape), data=data,
+                               indices=indices, indptr=indptr, names=numpy.array(self.names, dtype=str))
+        return path if path.endswith('.npz') else path + '.npz'
+
+
+def load_names(path):
+    '''THE CONCEPT INDEX STORED BY SubsumptionMatrix.save_npz: names[i] IS ROW/COLUMN i'''
+    import numpy
+    with numpy.load(path) as loaded:
+        return [str(name) for name in loaded['names']]
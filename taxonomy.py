@@ -0,0 +1,77 @@
+from normal_form import BOTTOM
+
+
+class AncestorIndex:
+    '''EVERY NAMED SUBSUMER OF EVERY CLASS AS ONE BITSET (A PYTHON int)
+
+    Bit i stands for concept_ids[i], so the common subsumers of any number
+    of classes are one & per class, and "is A ⊑ B" is a single shift. Built
+    once from a finished classification; after that no query touches the
+    saturation again.
+    '''
+    def __init__(self, classification):
+        tbox = classification.tbox
+        model = classification.model
+        self.tbox = tbox
+        self.concept_ids = tbox.concept_names()
+        self.position = {A: i for i, A in enumerate(self.concept_ids)}
+        everything = (1 << len(self.concept_ids)) - 1
+
+        self.ancestors = {}
+        for A in self.concept_ids:
+            label = model.get(A, ())
+            if BOTTOM in label:
+                # AN UNSATISFIABLE CLASS IS SUBSUMED BY EVERYTHING
+                self.ancestors[A] = everything
+                continue
+            mask = 0
+            for B in label:
+                i = self.position.get(B)
+                if i is not None:
+                    mask |= 1 << i
+            self.ancestors[A] = mask
+
+        # STRICT: WITHOUT A ITSELF AND THE CLASSES EQUIVALENT TO IT
+        self.strict = {}
+        for A in self.concept_ids:
+            mask = self.ancestors[A]
+            bit = 1 << self.position[A]
+            equivalent = 0
+            for B in self.members(mask):
+                if self.ancestors[B] & bit:
+                    equivalent |= 1 << self.position[B]
+            self.strict[A] = mask & ~equivalent
+
+    def members(self, mask):
+        '''CONCEPT IDS OF THE BITS SET IN mask'''
+        concept_ids = self.concept_ids
+        while mask:
+            low = mask & -mask
+            yield concept_ids[low.bit_length() - 1]
+            mask ^= low
+
+    def subsumes(self, B, A):
+        '''A ⊑ B?'''
+        return bool(self.ancestors[A] >> self.position[B] & 1)
+
+    def common_mask(self, concepts):
+        mask = -1
+        for A in concepts:
+            mask &= self.ancestors[A]
+        return mask if mask != -1 else 0
+
+    def common_subsumers(self, concepts):
+        '''IDS OF THE NAMED CLASSES SUBSUMING EVERY ONE OF concepts'''
+        return list(self.members(self.common_mask(concepts)))
+
+    def least_common_subsumers(self, concepts):
+        '''THE MOST SPECIFIC COMMON SUBSUMERS (SEVERAL IF THEY ARE EQUIVALENT OR INCOMPARABLE)
+
+        A common subsumer is dropped as soon as another common subsumer
+        lies strictly below it, so this costs one | per common subsumer.
+        '''
+        common = self.common_mask(concepts)
+        below = 0
+        for B in self.members(common):
+            below |= self.strict[B]
+        return list(self.members(common & ~below))